@@ -1,15 +1,18 @@
-import os
+import sys
+from pathlib import Path
 import pandas as pd
-from supabase import create_client
-from dotenv import load_dotenv
 from scipy.signal import argrelextrema
 import numpy as np
 
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client
+
 def analyze_trend_rhythm():
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    supabase = create_client(url, key)
+    supabase = get_supabase_client()
     
     # Fetch data for a high-volume keyword to get a clear signal
     print("Fetching 'anxiety' trend data for Singapore...")
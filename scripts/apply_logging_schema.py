@@ -1,12 +1,15 @@
-import os
-from supabase import create_client
-from dotenv import load_dotenv
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client
 
 def create_logging_table():
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    supabase = create_client(url, key)
+    supabase = get_supabase_client()
 
     sql = """
     CREATE TABLE IF NOT EXISTS research_logs (
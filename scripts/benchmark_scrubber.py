@@ -0,0 +1,67 @@
+"""
+Throughput benchmark: PIIScrubber.scrub (per row) vs PIIScrubber.scrub_many (nlp.pipe batches).
+
+Usage:
+    python scripts/benchmark_scrubber.py --rows 500 --batch-size 50
+
+Texts come from the `content` column of docs/data_sample.csv (or --csv), repeated
+until --rows is reached. Both paths run on the same texts and the script fails
+loudly if their outputs differ.
+"""
+import csv
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add project root and src/data to sys.path
+root_path = Path(__file__).resolve().parent.parent
+for path in (root_path, root_path / "src" / "data"):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from scrubber import PIIScrubber
+
+def load_texts(csv_path: Path, rows: int):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        sample = [row["content"] for row in csv.DictReader(f) if row.get("content")]
+    if not sample:
+        print(f"No content found in {csv_path}")
+        sys.exit(1)
+    return [sample[i % len(sample)] for i in range(rows)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(root_path / "docs" / "data_sample.csv"), help="CSV with a 'content' column")
+    parser.add_argument("--rows", type=int, default=500, help="Texts to scrub per run (default: 500)")
+    parser.add_argument("--batch-size", type=int, default=50, help="nlp.pipe batch size (default: 50)")
+    args = parser.parse_args()
+
+    texts = load_texts(Path(args.csv), args.rows)
+    scrubber = PIIScrubber()
+    # Warm up both paths so model loading is not counted
+    scrubber.scrub(texts[0])
+    scrubber.scrub_many(texts[:2])
+
+    started = time.perf_counter()
+    per_row = [scrubber.scrub(text) for text in texts]
+    per_row_secs = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = scrubber.scrub_many(texts, batch_size=args.batch_size)
+    batched_secs = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(per_row, batched) if a != b)
+    print(f"\nTexts: {len(texts)} (batch size {args.batch_size})")
+    print(f"{'mode':<12} {'seconds':>9} {'rows/sec':>10}")
+    print(f"{'scrub':<12} {per_row_secs:>9.2f} {len(texts) / per_row_secs:>10.1f}")
+    print(f"{'scrub_many':<12} {batched_secs:>9.2f} {len(texts) / batched_secs:>10.1f}")
+    print(f"Speedup: {per_row_secs / batched_secs:.2f}x")
+
+    if mismatches:
+        print(f"FAILURE: {mismatches} outputs differ between scrub and scrub_many.")
+        sys.exit(1)
+    print("SUCCESS: scrub_many output is identical to per-row scrub.")
+
+if __name__ == "__main__":
+    main()
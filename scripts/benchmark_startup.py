@@ -0,0 +1,96 @@
+"""
+Cold-start report for the FastAPI app (and optionally the PII scrubber).
+
+Runs `python -X importtime` in a fresh interpreter for each target, then prints the
+total import time, the slowest modules by cumulative time and whether any heavy
+dependency (google.generativeai, supabase, presidio, pandas) was pulled in at import.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --top 25 --scrubber
+    python scripts/benchmark_startup.py --warmup   # also times SemanticSearch.warm_up() (needs real .env)
+
+Placeholder credentials are set for the import run if none are configured, so no
+network call is made unless --warmup is given.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+root_path = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["google.generativeai", "supabase", "presidio_analyzer", "presidio_anonymizer", "spacy", "pandas"]
+
+TARGETS = {
+    "app": "import src.ai.app",
+    "scrubber": "import sys; sys.path.append('src/data'); import scrubber",
+}
+
+def run_importtime(statement: str):
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://localhost:54321")
+    env.setdefault("SUPABASE_SERVICE_ROLE_KEY", "startup-benchmark")
+    env.setdefault("GEMINI_API_KEY", "startup-benchmark")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=root_path, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise RuntimeError(f"'{statement}' failed with exit code {proc.returncode}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Indentation encodes nesting depth; depth 0 entries are top-level imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return wall, modules
+
+def report(label: str, statement: str, top: int):
+    wall, modules = run_importtime(statement)
+    # Top-level entries (no leading indentation) add up to the full import cost
+    total_us = sum(cumulative for _, depth, _, cumulative in modules if depth == 0)
+    names = {name for name, _, _, _ in modules}
+
+    print(f"\n=== {label}: `{statement}` ===")
+    print(f"Interpreter wall time: {wall * 1000:.0f} ms  |  import time: {total_us / 1000:.0f} ms  |  modules: {len(modules)}")
+    print(f"{'cumulative':>11} {'self':>9}  module")
+    for name, _, self_us, cumulative_us in sorted(modules, key=lambda m: m[3], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>9.1f}ms {self_us / 1000:>7.1f}ms  {name}")
+
+    loaded = [m for m in HEAVY_MODULES if m in names]
+    print(f"Heavy dependencies imported at startup: {', '.join(loaded) if loaded else 'none'}")
+
+def time_warmup():
+    code = (
+        "import time; t = time.perf_counter(); import src.ai.app as a; "
+        "t1 = time.perf_counter(); a.search_engine.warm_up(); t2 = time.perf_counter(); "
+        "print(f'import {(t1 - t) * 1000:.0f} ms, warm_up {(t2 - t1) * 1000:.0f} ms')"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=root_path, capture_output=True, text=True)
+    print("\n=== SemanticSearch.warm_up() ===")
+    print(proc.stdout.strip().splitlines()[-1] if proc.returncode == 0 else proc.stderr[-2000:])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list (default: 15)")
+    parser.add_argument("--scrubber", action="store_true", help="Also report src/data/scrubber.py")
+    parser.add_argument("--warmup", action="store_true", help="Also time SemanticSearch.warm_up() against the real backends")
+    args = parser.parse_args()
+
+    report("app", TARGETS["app"], args.top)
+    if args.scrubber:
+        report("scrubber", TARGETS["scrubber"], args.top)
+    if args.warmup:
+        time_warmup()
+
+if __name__ == "__main__":
+    main()
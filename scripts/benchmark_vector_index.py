@@ -0,0 +1,109 @@
+"""
+Memory / recall / throughput benchmark for LocalVectorIndex quantization (none, int8, pq).
+
+Usage:
+    python scripts/benchmark_vector_index.py --rows 20000 --queries 200
+    python scripts/benchmark_vector_index.py --snapshot .cache/local_index
+
+Vectors come from a saved index snapshot (--snapshot, e.g. written by
+LocalVectorIndex.save() after a build from social_posts.embedding) or, by
+default, from a synthetic clustered corpus of unit vectors. Queries are
+perturbed corpus vectors. Recall@k is measured against exact float cosine
+top-k. Quantized configurations keep the float vectors in a memory-mapped file
+(as LOCAL_INDEX_VECTOR_FILE does), so "resident" counts codes + codebooks only.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.ai.vector_index import LocalVectorIndex
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, seed: int = 0):
+    """Unit vectors scattered around `clusters` topic directions (rough stand-in for narrative embeddings)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.06 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(vectors, count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), size=count, replace=False)]
+    queries = picks + 0.04 * rng.standard_normal(picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def build_index(vectors, quantization: str, rerank: int, pq_m: int, vector_file: str = None):
+    index = LocalVectorIndex(None, quantization=quantization, rerank=rerank, pq_m=pq_m,
+                             dim=vectors.shape[1], vector_file=vector_file)
+    rows = [{"id": str(i), "embedding": vector} for i, vector in enumerate(vectors)]
+    started = time.perf_counter()
+    index.add(rows)
+    return index, time.perf_counter() - started
+
+def run_queries(index, queries, k: int):
+    results = []
+    started = time.perf_counter()
+    for q in queries:
+        results.append([row["id"] for row in index.search(q, threshold=-1.0, limit=k)])
+    return results, len(queries) / (time.perf_counter() - started)
+
+def recall(results, truth):
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", help="LocalVectorIndex snapshot directory (vectors.npy) to benchmark instead of synthetic data")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic corpus size (default: 20000)")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic vector dimension (default: 768)")
+    parser.add_argument("--clusters", type=int, default=200, help="Synthetic topic count (default: 200)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per configuration (default: 200)")
+    parser.add_argument("-k", type=int, default=10, help="Results per query / recall@k (default: 10)")
+    parser.add_argument("--pq-m", type=int, default=96, help="PQ subspaces = bytes per vector (default: 96)")
+    parser.add_argument("--rerank", default="1,4,10", help="Comma-separated re-rank factors to test (default: 1,4,10)")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        vectors = np.asarray(np.load(os.path.join(args.snapshot, "vectors.npy")), dtype=np.float32)
+        source = f"snapshot {args.snapshot}"
+    else:
+        vectors = synthetic_corpus(args.rows, args.dim, args.clusters)
+        source = f"synthetic ({args.clusters} clusters)"
+    queries = make_queries(vectors, min(args.queries, len(vectors)))
+    print(f"\nCorpus: {len(vectors)} x {vectors.shape[1]} ({source}), {len(queries)} queries, k={args.k}")
+
+    exact, build_s = build_index(vectors, "none", 1, args.pq_m)
+    truth, exact_qps = run_queries(exact, queries, args.k)
+
+    print(f"{'config':<16} {'resident MB':>11} {'B/vector':>9} {'build s':>8} {'recall@k':>9} {'QPS':>8}")
+    memory = exact.memory_stats()
+    print(f"{'float32 exact':<16} {memory['resident_bytes'] / 1e6:>11.1f} {memory['float_bytes'] / len(vectors):>9.0f} "
+          f"{build_s:>8.1f} {1.0:>9.3f} {exact_qps:>8.1f}")
+    del exact
+
+    rerank_factors = [int(x) for x in args.rerank.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        for quantization in ("int8", "pq"):
+            vector_file = os.path.join(tmp, f"{quantization}.f32")
+            index, build_s = build_index(vectors, quantization, rerank_factors[0], args.pq_m, vector_file)
+            memory = index.memory_stats()
+            for factor in rerank_factors:
+                index.rerank = factor
+                results, qps = run_queries(index, queries, args.k)
+                label = f"{quantization} rerank x{factor}"
+                print(f"{label:<16} {memory['resident_bytes'] / 1e6:>11.1f} {memory['code_bytes'] / len(vectors):>9.0f} "
+                      f"{build_s:>8.1f} {recall(results, truth):>9.3f} {qps:>8.1f}")
+            del index
+
+if __name__ == "__main__":
+    main()
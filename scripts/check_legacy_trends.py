@@ -1,12 +1,15 @@
-import os
-from dotenv import load_dotenv
-from supabase import create_client
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client
 
 def check_legacy_trends():
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    supabase = create_client(url, key)
+    supabase = get_supabase_client()
 
     try:
         print("Checking for legacy 'Google Trends' records in 'social_posts'...")
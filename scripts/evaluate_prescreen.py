@@ -0,0 +1,106 @@
+"""
+Evaluates the PIIScrubber pre-screen (strict=False) against the full pipeline (strict=True).
+
+Usage:
+    python scripts/evaluate_prescreen.py                      # docs/prescreen_sample.csv
+    python scripts/evaluate_prescreen.py --csv labeled.csv    # uses its 'has_pii' column
+    python scripts/evaluate_prescreen.py --csv docs/data_sample.csv --rows 500
+
+Labels: if the CSV has a `has_pii` column (true/false, 1/0) it is used as ground
+truth. Otherwise the full strict pipeline is the reference and a text counts as
+containing PII when strict scrubbing changes it.
+
+The default sample (docs/prescreen_sample.csv) holds 200 labeled posts, 80 with
+PII: names, phones, emails, URLs and places, including the lower-case and
+sentence-initial forms the pre-screen is known to miss. --rows only repeats
+texts, which changes the timing but not the recall estimate.
+
+Reports the share of texts that skip NER, the speedup, and the recall loss, i.e.
+PII-bearing texts the pre-screen let through unscrubbed. Run this on a
+representative sample before enabling strict=False anywhere.
+"""
+import csv
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add project root and src/data to sys.path
+root_path = Path(__file__).resolve().parent.parent
+for path in (root_path, root_path / "src" / "data"):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from scrubber import PIIScrubber, needs_analysis
+
+def load_sample(csv_path: Path, rows: int):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        sample = [row for row in csv.DictReader(f) if row.get("content")]
+    if not sample:
+        print(f"No content found in {csv_path}")
+        sys.exit(1)
+    texts = [row["content"] for row in sample]
+    labels = None
+    if "has_pii" in sample[0]:
+        labels = [str(row["has_pii"]).strip().lower() in ("1", "true", "yes") for row in sample]
+    if rows and rows > len(texts):
+        texts = [texts[i % len(texts)] for i in range(rows)]
+        labels = [labels[i % len(labels)] for i in range(rows)] if labels else None
+    return texts, labels
+
+def timed_scrub(scrubber, texts, batch_size):
+    started = time.perf_counter()
+    output = scrubber.scrub_many(texts, batch_size=batch_size)
+    return output, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(root_path / "docs" / "prescreen_sample.csv"), help="CSV with a 'content' column (optional 'has_pii')")
+    parser.add_argument("--rows", type=int, default=0, help="Repeat the sample up to this many texts (default: sample size)")
+    parser.add_argument("--batch-size", type=int, default=50, help="nlp.pipe batch size (default: 50)")
+    parser.add_argument("--show-misses", type=int, default=5, help="Missed texts to print (default: 5)")
+    args = parser.parse_args()
+
+    texts, labels = load_sample(Path(args.csv), args.rows)
+    strict = PIIScrubber(strict=True)
+    screened = PIIScrubber(strict=False)
+    # Load Presidio/spaCy up front so model loading is not counted. A warm-up scrub is
+    # not enough for the pre-screen: if its texts skip NER the model never loads.
+    strict.warm_up()
+    screened.warm_up()
+
+    strict_out, strict_secs = timed_scrub(strict, texts, args.batch_size)
+    screened_out, screened_secs = timed_scrub(screened, texts, args.batch_size)
+
+    if labels is None:
+        labels = [out != text for out, text in zip(strict_out, texts)]
+        label_source = "full pipeline (strict=True)"
+    else:
+        label_source = f"'has_pii' column of {args.csv}"
+
+    flagged = [needs_analysis(text) for text in texts]
+    positives = [i for i, has_pii in enumerate(labels) if has_pii]
+    missed = [i for i in positives if not flagged[i]]
+    differing = sum(1 for a, b in zip(strict_out, screened_out) if a != b)
+    recall = 1 - len(missed) / len(positives) if positives else 1.0
+
+    print(f"\nTexts: {len(texts)}  |  Labels: {label_source}")
+    print(f"Texts with PII:           {len(positives)}")
+    print(f"Sent to NER (pre-screen): {sum(flagged)} ({sum(flagged) / len(texts):.0%})")
+    print(f"Skipped NER:              {len(texts) - sum(flagged)} ({1 - sum(flagged) / len(texts):.0%})")
+    print(f"Strict:     {strict_secs:>7.2f}s ({len(texts) / strict_secs:.1f} rows/sec)")
+    print(f"Pre-screen: {screened_secs:>7.2f}s ({len(texts) / screened_secs:.1f} rows/sec)")
+    print(f"Speedup:    {strict_secs / screened_secs:.2f}x")
+    print(f"Recall:     {recall:.3f} ({len(missed)}/{len(positives)} PII texts skipped NER)")
+    print(f"Outputs differing from strict: {differing}")
+
+    unique_positives = len({texts[i] for i in positives})
+    if unique_positives < 30:
+        print(f"WARNING: only {unique_positives} distinct PII texts; the recall figure is not meaningful. "
+              f"Use a larger labeled sample (--csv).")
+
+    for i in missed[:args.show_misses]:
+        print(f"  MISSED: {texts[i][:120]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+In-memory stand-ins for the Supabase client and Gemini SDK so pipelines can be exercised offline.
+
+Only the subset of the PostgREST query builder used by this repository is
+implemented (select/filters/order/limit/insert/update/upsert/rpc). Rows live
+in plain dicts keyed by table name. Optional per-request latency simulates
+network round-trips (blocking, like the real synchronous client).
+"""
+import copy
+import time
+import asyncio
+import hashlib
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.descending = False
+        self.row_limit = None
+        self.count_mode = None
+        self._negate = False
+
+    # --- Query builder ---
+    def select(self, columns="*", count=None):
+        self.count_mode = count
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _add(self, predicate):
+        if self._negate:
+            self._negate = False
+            self.filters.append(lambda row: not predicate(row))
+        else:
+            self.filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._add(lambda row: row.get(column) == value)
+
+    def gt(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def is_(self, column, value):
+        if value == "null":
+            return self._add(lambda row: row.get(column) is None)
+        return self._add(lambda row: row.get(column) is value)
+
+    def ilike(self, column, pattern):
+        return self._add(lambda row: (row.get(column) or "").lower() == pattern.lower())
+
+    def in_(self, column, values):
+        return self._add(lambda row: row.get(column) in values)
+
+    def or_(self, expression):
+        # Supports the "col.op.value,col.op.value" forms used in this repo
+        clauses = []
+        for clause in expression.split(","):
+            column, op, value = clause.split(".", 2)
+            clauses.append((column, op, value))
+
+        def predicate(row):
+            for column, op, value in clauses:
+                cell = row.get(column)
+                if op == "ilike" and (cell or "").lower() == value.lower():
+                    return True
+                if op == "eq" and str(cell).lower() == value.lower():
+                    return True
+                if op == "neq" and cell is not None and str(cell).lower() != value.lower():
+                    return True
+                if op == "is" and value == "null" and cell is None:
+                    return True
+            return False
+        return self._add(predicate)
+
+    def order(self, column, desc=False):
+        self.order_by = column
+        self.descending = desc
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def insert(self, rows):
+        self.op = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values):
+        self.op = "update"
+        self.payload = values
+        return self
+
+    def upsert(self, rows, on_conflict="id", **kwargs):
+        self.op = "upsert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.on_conflict = on_conflict
+        return self
+
+    # --- Execution ---
+    def _matching(self, rows):
+        return [row for row in rows if all(f(row) for f in self.filters)]
+
+    def execute(self):
+        self.client.calls.append((self.table_name, self.op))
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        if self.client.fail_next:
+            self.client.fail_next -= 1
+            raise RuntimeError("FakeSupabase: injected failure")
+
+        rows = self.client.tables.setdefault(self.table_name, [])
+
+        if self.op in ("insert", "upsert"):
+            self.client._check_not_null(self.table_name, self.payload)
+
+        if self.op == "insert":
+            rows.extend(copy.deepcopy(self.payload))
+            return FakeResponse(copy.deepcopy(self.payload))
+
+        if self.op == "update":
+            matched = self._matching(rows)
+            for row in matched:
+                row.update(copy.deepcopy(self.payload))
+            return FakeResponse(copy.deepcopy(matched))
+
+        if self.op == "upsert":
+            by_key = {row.get(self.on_conflict): row for row in rows}
+            for record in self.payload:
+                existing = by_key.get(record.get(self.on_conflict))
+                if existing is not None:
+                    existing.update(copy.deepcopy(record))
+                else:
+                    rows.append(copy.deepcopy(record))
+            return FakeResponse(copy.deepcopy(self.payload))
+
+        matched = self._matching(rows)
+        if self.order_by:
+            matched.sort(key=lambda row: (row.get(self.order_by) is None, row.get(self.order_by)),
+                         reverse=self.descending)
+        count = len(matched) if self.count_mode else None
+        if self.row_limit is not None:
+            matched = matched[:self.row_limit]
+        return FakeResponse(copy.deepcopy(matched), count=count)
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client.calls.append((self.name, "rpc"))
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        handler = self.client.rpc_handlers.get(self.name)
+        if handler is None:
+            # Same wording as PostgREST, so callers' "migration missing" fallbacks are exercised
+            raise RuntimeError(f"{{'code': 'PGRST202', 'message': 'Could not find the function public.{self.name} in the schema cache'}}")
+        return FakeResponse(handler(self.client, **self.params))
+
+class FakeSupabaseClient:
+    """
+    Drop-in replacement for `supabase.Client` backed by in-memory tables.
+
+    Args:
+        tables: Optional initial data, e.g. {"social_posts": [{...}, ...]}.
+        rpc_handlers: Optional {name: callable(client, **params) -> list} for .rpc() calls.
+        latency: Seconds each request blocks for, simulating a network round-trip.
+        not_null: Optional {table: [columns]}; insert/upsert rows missing one of them are
+            rejected like Postgres does (an upsert is an INSERT ... ON CONFLICT, so partial
+            rows fail even when the id exists).
+    """
+    def __init__(self, tables: dict = None, rpc_handlers: dict = None, latency: float = 0.0,
+                 not_null: dict = None):
+        self.tables = copy.deepcopy(tables) if tables else {}
+        self.not_null = not_null or {}
+        self.rpc_handlers = rpc_handlers or {}
+        self.latency = latency
+        self.calls = []
+        self.fail_next = 0
+
+    def table(self, name: str):
+        return FakeQuery(self, name)
+
+    def _check_not_null(self, table: str, rows: list):
+        for row in rows:
+            for column in self.not_null.get(table, []):
+                if row.get(column) is None:
+                    raise RuntimeError(f"{{'code': '23502', 'message': 'null value in column \"{column}\" "
+                                       f"of relation \"{table}\" violates not-null constraint'}}")
+
+    def rpc(self, name: str, params: dict = None):
+        return FakeRPC(self, name, params or {})
+
+def bulk_update_rows(client, table: str, updates: list, key: str = "id") -> int:
+    """UPDATE-only bulk RPC handler (like bulk_update_scrubbed): returns the number of rows updated."""
+    by_key = {row.get(key): row for row in client.tables.get(table, [])}
+    updated = 0
+    for record in updates:
+        row = by_key.get(record.get(key))
+        if row is not None:
+            row.update(copy.deepcopy(record))
+            updated += 1
+    return updated
+
+# --- Gemini ---
+def fake_embedding(text: str, dim: int = 768):
+    """Deterministic unit-scale vector derived from the text hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] / 255.0) - 0.5 for i in range(dim)]
+
+class FakeGenerateResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+def install_fake_gemini(latency: float = 0.0, response_text: str = None, chunks: list = None):
+    """
+    Monkeypatches google.generativeai so embeddings and generations run offline.
+
+    Sync calls block for `latency` seconds; async calls await it. Streaming
+    generations (stream=True) yield `chunks`.
+    """
+    import google.generativeai as genai
+
+    text = response_text or '{"decision": "SATURATED", "reason": "Fake audit", "confidence": 90}'
+    stream_chunks = chunks or ["Fake ", "synthesis ", "output."]
+
+    def embed_content(model, content, task_type=None, **kwargs):
+        if latency:
+            time.sleep(latency)
+        if isinstance(content, list):
+            return {"embedding": [fake_embedding(c) for c in content]}
+        return {"embedding": fake_embedding(content)}
+
+    async def embed_content_async(model, content, task_type=None, **kwargs):
+        if latency:
+            await asyncio.sleep(latency)
+        if isinstance(content, list):
+            return {"embedding": [fake_embedding(c) for c in content]}
+        return {"embedding": fake_embedding(content)}
+
+    class FakeGenerativeModel:
+        def __init__(self, model_name, **kwargs):
+            self.model_name = model_name
+
+        def generate_content(self, prompt, stream=False, **kwargs):
+            if latency:
+                time.sleep(latency)
+            if stream:
+                return iter([FakeGenerateResponse(c) for c in stream_chunks])
+            return FakeGenerateResponse(text)
+
+        async def generate_content_async(self, prompt, stream=False, **kwargs):
+            if latency:
+                await asyncio.sleep(latency)
+            if stream:
+                async def _chunks():
+                    for c in stream_chunks:
+                        yield FakeGenerateResponse(c)
+                return _chunks()
+            return FakeGenerateResponse(text)
+
+    genai.configure = lambda **kwargs: None
+    genai.embed_content = embed_content
+    genai.embed_content_async = embed_content_async
+    genai.GenerativeModel = FakeGenerativeModel
+    return genai
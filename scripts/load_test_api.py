@@ -0,0 +1,111 @@
+"""
+Offline load test for the FastAPI endpoints against stubbed Supabase/Gemini backends.
+
+Every backend call is given a fixed latency (default 100 ms) so the test measures
+how well requests overlap: with a non-blocking I/O layer, throughput should grow
+roughly linearly with concurrency until the thread pool size is reached.
+
+Usage:
+    python scripts/load_test_api.py --latency 0.1 --requests 64
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+import httpx
+from scripts.fake_backends import FakeSupabaseClient, install_fake_gemini
+
+def seed_rows(n=600):
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "content_scrubbed": f"narrative {i}",
+            "content": f"narrative {i}",
+            "platform": "Reddit",
+            "post_dt": "2025-12-23T18:53:50+00:00",
+            "region": "Singapore" if i % 2 else "Global",
+            "bucket_id": "other",
+            "ai_bucket_id": "stress" if i % 3 else None,
+            "ai_explanation": "seeded" if i % 3 else None,
+            "similarity": 0.9 - i / 1000,
+            "embedding_model": "text-embedding-004"
+        }
+        for i in range(n)
+    ]
+
+def match_handler(rows):
+    def handler(client, query_embedding, match_threshold, match_count, filter_region=None, filter_ai_only=False,
+                filter_model=None):
+        matched = [
+            r for r in rows
+            if r["similarity"] > match_threshold
+            and (not filter_region or r["region"] in ("Singapore", "SG"))
+            and (not filter_ai_only or r["ai_bucket_id"])
+            and (not filter_model or r["embedding_model"] == filter_model)
+        ]
+        return matched[:match_count]
+    return handler
+
+async def run_level(client, concurrency: int, total: int):
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+    latencies = []
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # Unique queries so the query-embedding cache does not hide the embedding call
+            payload = {"query": f"exam stress {i} c{concurrency}", "limit": 12, "ai_only": bool(i % 2), "sg_only": bool(i % 3)}
+            started = time.perf_counter()
+            resp = await client.post("/api/search", json=payload)
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return total / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+async def main(latency: float, total: int, levels: list):
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "offline-load-test")
+    os.environ.setdefault("GEMINI_API_KEY", "offline-load-test")
+    install_fake_gemini(latency=latency)
+
+    os.chdir(root_path)  # StaticFiles mount is relative to the project root
+    from src.ai import app as app_module
+
+    rows = seed_rows()
+    app_module.search_engine.supabase = FakeSupabaseClient(
+        rpc_handlers={"match_social_posts": match_handler(rows)},
+        latency=latency
+    )
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        print(f"\nBackend latency per call: {latency * 1000:.0f} ms, requests per level: {total}")
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50':>9} {'p95':>9}")
+        for concurrency in levels:
+            rps, p50, p95 = await run_level(client, concurrency, total)
+            print(f"{concurrency:>11} {rps:>8.1f} {p50 * 1000:>7.0f}ms {p95 * 1000:>7.0f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for /api/search")
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated latency per backend call (seconds)")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--levels", default="1,4,16,32", help="Comma-separated concurrency levels")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.requests, [int(x) for x in args.levels.split(",")]))
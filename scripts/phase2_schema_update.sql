@@ -25,12 +25,17 @@ CREATE EXTENSION IF NOT EXISTS vector;
 -- NOTE: We drop first because PostgreSQL doesn't allow changing return types with CREATE OR REPLACE
 DROP FUNCTION IF EXISTS match_social_posts(vector, float, int);
 DROP FUNCTION IF EXISTS match_social_posts(vector, float, int, text);
+DROP FUNCTION IF EXISTS match_social_posts(vector, float, int, text, boolean);
+-- Re-running this after phase5 replaces its filter_model overload instead of leaving two
+-- (an ambiguous call for PostgREST); re-apply phase5 afterwards to restore filter_model
+DROP FUNCTION IF EXISTS match_social_posts(vector, float, int, text, boolean, text);
 
 CREATE OR REPLACE FUNCTION match_social_posts (
   query_embedding vector(768),
   match_threshold float,
   match_count int,
-  filter_region text DEFAULT NULL
+  filter_region text DEFAULT NULL,
+  filter_ai_only boolean DEFAULT FALSE
 )
 RETURNS TABLE (
   id uuid,
@@ -66,6 +71,8 @@ BEGIN
     OR (filter_region = 'Singapore' AND social_posts.region IN ('Singapore', 'SG'))
     OR (social_posts.region = filter_region)
   )
+  -- Verified toggle: only AI-classified rows (same rule as the banner count)
+  AND (NOT filter_ai_only OR social_posts.ai_bucket_id IS NOT NULL)
   ORDER BY similarity DESC
   LIMIT match_count;
 END;
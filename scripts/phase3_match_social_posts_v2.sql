@@ -0,0 +1,123 @@
+-- Versioned migration: ANN-friendly semantic search for Project Shadee-Intelligence
+-- Adds match_social_posts_v2 alongside the original RPC (which is left untouched).
+--
+-- Why a v2:
+-- match_social_posts filters on `1 - (embedding <=> q) > threshold` and orders by the
+-- computed alias, so Postgres must evaluate the distance for every embedded row
+-- (sequential scan) and computes it twice. v2 orders by the raw `<=>` operator, which
+-- lets the planner walk an HNSW index, and applies the similarity threshold to the
+-- top-k afterwards.
+
+-- 1. HNSW index over all embeddings (cosine distance)
+CREATE INDEX IF NOT EXISTS social_posts_embedding_hnsw_idx
+ON social_posts USING hnsw (embedding vector_cosine_ops);
+
+-- 2. Partial indexes for the pre-filters used by the UI toggles
+-- Verified toggle: only AI-classified rows
+CREATE INDEX IF NOT EXISTS social_posts_embedding_ai_hnsw_idx
+ON social_posts USING hnsw (embedding vector_cosine_ops)
+WHERE ai_bucket_id IS NOT NULL;
+
+-- Singapore toggle: both region spellings
+CREATE INDEX IF NOT EXISTS social_posts_embedding_sg_hnsw_idx
+ON social_posts USING hnsw (embedding vector_cosine_ops)
+WHERE region IN ('Singapore', 'SG');
+
+-- 3. Vector Similarity Search Function (v2)
+DROP FUNCTION IF EXISTS match_social_posts_v2(vector, float, int, text, boolean);
+-- Re-running this after phase5 replaces its filter_model overload instead of leaving two
+-- (an ambiguous call for PostgREST); re-apply phase5 afterwards to restore filter_model
+DROP FUNCTION IF EXISTS match_social_posts_v2(vector, float, int, text, boolean, text);
+
+CREATE OR REPLACE FUNCTION match_social_posts_v2 (
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int,
+  filter_region text DEFAULT NULL,
+  filter_ai_only boolean DEFAULT FALSE
+)
+RETURNS TABLE (
+  id uuid,
+  content_scrubbed text,
+  content text,
+  platform text,
+  post_dt timestamptz,
+  region text,
+  bucket_id text,
+  ai_bucket_id text,
+  ai_explanation text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  filters text := '';
+  pgvector_version int[];
+BEGIN
+  -- Filters are inlined as literals (dynamic SQL) so each call is planned with the
+  -- actual predicates and the matching partial index above can be chosen.
+  IF filter_region = 'Singapore' THEN
+    filters := filters || ' AND sp.region IN (''Singapore'', ''SG'')';
+  ELSIF filter_region IS NOT NULL THEN
+    filters := filters || format(' AND sp.region = %L', filter_region);
+  END IF;
+
+  IF filter_ai_only THEN
+    filters := filters || ' AND sp.ai_bucket_id IS NOT NULL';
+  END IF;
+
+  -- An HNSW scan returns at most hnsw.ef_search rows, and filters that no single
+  -- partial index covers (e.g. Singapore + Verified + model) are applied to those
+  -- rows afterwards, so a filtered search could return far fewer than match_count.
+  SELECT string_to_array(split_part(extversion, '-', 1), '.')::int[] INTO pgvector_version
+  FROM pg_extension WHERE extname = 'vector';
+
+  IF pgvector_version >= ARRAY[0, 8] THEN
+    -- pgvector 0.8+: keep walking the graph until match_count rows pass the filters
+    -- (bounded by hnsw.max_scan_tuples). relaxed_order may yield rows slightly out of
+    -- order; the outer ORDER BY restores it.
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.ef_search', GREATEST(match_count, 40)::text, true);
+  ELSIF filters <> '' THEN
+    -- Older pgvector: widen the candidate list instead (ef_search is capped at 1000).
+    -- Costs latency; very selective filters can still come back short.
+    PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(match_count, 40) * 10, 1000)::text, true);
+  ELSE
+    PERFORM set_config('hnsw.ef_search', GREATEST(match_count, 40)::text, true);
+  END IF;
+
+  RETURN QUERY EXECUTE format($query$
+    SELECT
+      top_k.id,
+      top_k.content_scrubbed,
+      top_k.content,
+      top_k.platform,
+      top_k.post_dt,
+      top_k.region,
+      top_k.bucket_id,
+      top_k.ai_bucket_id,
+      top_k.ai_explanation,
+      (1 - top_k.distance)::float AS similarity
+    FROM (
+      SELECT
+        sp.id,
+        sp.content_scrubbed,
+        sp.content,
+        sp.platform,
+        sp.post_dt,
+        sp.region,
+        sp.bucket_id,
+        sp.ai_bucket_id,
+        sp.ai_explanation,
+        sp.embedding <=> $1 AS distance
+      FROM social_posts sp
+      WHERE sp.embedding IS NOT NULL %s
+      ORDER BY sp.embedding <=> $1
+      LIMIT $2
+    ) top_k
+    WHERE 1 - top_k.distance > $3
+    ORDER BY top_k.distance
+  $query$, filters)
+  USING query_embedding, match_count, match_threshold;
+END;
+$$;
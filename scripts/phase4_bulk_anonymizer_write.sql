@@ -0,0 +1,30 @@
+-- Bulk write path for src/data/bulk_anonymizer.py
+-- Applies a whole batch of scrubbing results in a single request.
+--
+-- [⚠️ GUARDIAN]: NON-DESTRUCTIVE SHADOW PATTERN.
+-- This function only UPDATEs existing rows and only sets 'content_scrubbed' and
+-- 'is_anonymized'. It never inserts rows and never touches the original 'content'.
+--
+-- Usage (PostgREST / supabase-py):
+--   supabase.rpc("bulk_update_scrubbed", {"updates": [{"id": ..., "content_scrubbed": ..., "is_anonymized": true}, ...]})
+
+CREATE OR REPLACE FUNCTION bulk_update_scrubbed (
+  updates jsonb
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated_count integer;
+BEGIN
+  UPDATE social_posts AS sp
+  SET
+    content_scrubbed = u.content_scrubbed,
+    is_anonymized = u.is_anonymized
+  FROM jsonb_to_recordset(updates) AS u(id uuid, content_scrubbed text, is_anonymized boolean)
+  WHERE sp.id = u.id;
+
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  RETURN updated_count;
+END;
+$$;
@@ -0,0 +1,194 @@
+-- Versioned migration: record which model produced each embedding (src/ai/embeddings.py)
+-- so vectors from different embedding models are never compared.
+--
+-- After this migration the indexer tags every vector it writes with
+-- social_posts.embedding_model, and both search RPCs accept filter_model. The
+-- Python side always sends filter_model; before the migration it only falls back
+-- to untagged search for Gemini text-embedding-004, which wrote all earlier rows.
+-- The search RPCs keep their existing parameters; filter_model defaults to NULL
+-- (no model filter).
+
+-- 1. Model tag per row; existing vectors were all produced by Gemini text-embedding-004
+ALTER TABLE social_posts
+ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+
+UPDATE social_posts
+SET embedding_model = 'text-embedding-004'
+WHERE embedding IS NOT NULL AND embedding_model IS NULL;
+
+-- 2. One HNSW index per model, so a model-filtered search stays an index scan
+--    (add one for any further EMBEDDING_LOCAL_MODEL you index with)
+CREATE INDEX IF NOT EXISTS social_posts_embedding_gemini004_hnsw_idx
+ON social_posts USING hnsw (embedding vector_cosine_ops)
+WHERE embedding_model = 'text-embedding-004';
+
+CREATE INDEX IF NOT EXISTS social_posts_embedding_mpnet_hnsw_idx
+ON social_posts USING hnsw (embedding vector_cosine_ops)
+WHERE embedding_model = 'all-mpnet-base-v2';
+
+-- Re-embedding lookups (indexer --reembed): rows not yet on a given model
+CREATE INDEX IF NOT EXISTS social_posts_embedding_model_idx
+ON social_posts (embedding_model);
+
+-- 3. match_social_posts (original RPC) with filter_model
+-- Every earlier overload is dropped: with two signatures left, PostgREST cannot pick
+-- one for a call that omits the defaulted arguments (PGRST203).
+DROP FUNCTION IF EXISTS match_social_posts(vector, float, int);
+DROP FUNCTION IF EXISTS match_social_posts(vector, float, int, text);
+DROP FUNCTION IF EXISTS match_social_posts(vector, float, int, text, boolean);
+DROP FUNCTION IF EXISTS match_social_posts(vector, float, int, text, boolean, text);
+
+CREATE OR REPLACE FUNCTION match_social_posts (
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int,
+  filter_region text DEFAULT NULL,
+  filter_ai_only boolean DEFAULT FALSE,
+  filter_model text DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  content_scrubbed text,
+  content text,
+  platform text,
+  post_dt timestamptz,
+  region text,
+  bucket_id text,
+  ai_bucket_id text,
+  ai_explanation text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    social_posts.id,
+    social_posts.content_scrubbed,
+    social_posts.content,
+    social_posts.platform,
+    social_posts.post_dt,
+    social_posts.region,
+    social_posts.bucket_id,
+    social_posts.ai_bucket_id,
+    social_posts.ai_explanation,
+    1 - (social_posts.embedding <=> query_embedding) AS similarity
+  FROM social_posts
+  WHERE 1 - (social_posts.embedding <=> query_embedding) > match_threshold
+  AND (
+    filter_region IS NULL 
+    OR (filter_region = 'Singapore' AND social_posts.region IN ('Singapore', 'SG'))
+    OR (social_posts.region = filter_region)
+  )
+  -- Verified toggle: only AI-classified rows (same rule as the banner count)
+  AND (NOT filter_ai_only OR social_posts.ai_bucket_id IS NOT NULL)
+  -- Only vectors from the query's embedding model
+  AND (filter_model IS NULL OR social_posts.embedding_model = filter_model)
+  ORDER BY similarity DESC
+  LIMIT match_count;
+END;
+$$;
+
+-- 4. match_social_posts_v2 (HNSW-indexable, phase3) with filter_model
+DROP FUNCTION IF EXISTS match_social_posts_v2(vector, float, int);
+DROP FUNCTION IF EXISTS match_social_posts_v2(vector, float, int, text);
+DROP FUNCTION IF EXISTS match_social_posts_v2(vector, float, int, text, boolean);
+DROP FUNCTION IF EXISTS match_social_posts_v2(vector, float, int, text, boolean, text);
+
+CREATE OR REPLACE FUNCTION match_social_posts_v2 (
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int,
+  filter_region text DEFAULT NULL,
+  filter_ai_only boolean DEFAULT FALSE,
+  filter_model text DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  content_scrubbed text,
+  content text,
+  platform text,
+  post_dt timestamptz,
+  region text,
+  bucket_id text,
+  ai_bucket_id text,
+  ai_explanation text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  filters text := '';
+  pgvector_version int[];
+BEGIN
+  -- Filters are inlined as literals (dynamic SQL) so each call is planned with the
+  -- actual predicates and the matching partial index above can be chosen.
+  IF filter_model IS NOT NULL THEN
+    filters := filters || format(' AND sp.embedding_model = %L', filter_model);
+  END IF;
+
+  IF filter_region = 'Singapore' THEN
+    filters := filters || ' AND sp.region IN (''Singapore'', ''SG'')';
+  ELSIF filter_region IS NOT NULL THEN
+    filters := filters || format(' AND sp.region = %L', filter_region);
+  END IF;
+
+  IF filter_ai_only THEN
+    filters := filters || ' AND sp.ai_bucket_id IS NOT NULL';
+  END IF;
+
+  -- An HNSW scan returns at most hnsw.ef_search rows, and filters that no single
+  -- partial index covers (e.g. Singapore + Verified + model) are applied to those
+  -- rows afterwards, so a filtered search could return far fewer than match_count.
+  SELECT string_to_array(split_part(extversion, '-', 1), '.')::int[] INTO pgvector_version
+  FROM pg_extension WHERE extname = 'vector';
+
+  IF pgvector_version >= ARRAY[0, 8] THEN
+    -- pgvector 0.8+: keep walking the graph until match_count rows pass the filters
+    -- (bounded by hnsw.max_scan_tuples). relaxed_order may yield rows slightly out of
+    -- order; the outer ORDER BY restores it.
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.ef_search', GREATEST(match_count, 40)::text, true);
+  ELSIF filters <> '' THEN
+    -- Older pgvector: widen the candidate list instead (ef_search is capped at 1000).
+    -- Costs latency; very selective filters can still come back short.
+    PERFORM set_config('hnsw.ef_search', LEAST(GREATEST(match_count, 40) * 10, 1000)::text, true);
+  ELSE
+    PERFORM set_config('hnsw.ef_search', GREATEST(match_count, 40)::text, true);
+  END IF;
+
+  RETURN QUERY EXECUTE format($query$
+    SELECT
+      top_k.id,
+      top_k.content_scrubbed,
+      top_k.content,
+      top_k.platform,
+      top_k.post_dt,
+      top_k.region,
+      top_k.bucket_id,
+      top_k.ai_bucket_id,
+      top_k.ai_explanation,
+      (1 - top_k.distance)::float AS similarity
+    FROM (
+      SELECT
+        sp.id,
+        sp.content_scrubbed,
+        sp.content,
+        sp.platform,
+        sp.post_dt,
+        sp.region,
+        sp.bucket_id,
+        sp.ai_bucket_id,
+        sp.ai_explanation,
+        sp.embedding <=> $1 AS distance
+      FROM social_posts sp
+      WHERE sp.embedding IS NOT NULL %s
+      ORDER BY sp.embedding <=> $1
+      LIMIT $2
+    ) top_k
+    WHERE 1 - top_k.distance > $3
+    ORDER BY top_k.distance
+  $query$, filters)
+  USING query_embedding, match_count, match_threshold;
+END;
+$$;
@@ -0,0 +1,34 @@
+-- Bulk write path for src/ai/indexer.py
+-- Writes a whole batch of embeddings in a single request.
+-- Requires scripts/phase5_embedding_model.sql (social_posts.embedding_model).
+--
+-- [⚠️ GUARDIAN]: NON-DESTRUCTIVE SHADOW PATTERN.
+-- This function only UPDATEs existing rows and only sets 'embedding' and
+-- 'embedding_model'. It never inserts rows (an id deleted since it was read is
+-- simply skipped) and never touches the original 'content'.
+--
+-- Usage (PostgREST / supabase-py):
+--   supabase.rpc("bulk_update_embeddings", {"updates": [{"id": ..., "embedding": [...], "embedding_model": ...}, ...]})
+-- Returns the number of rows actually updated.
+
+CREATE OR REPLACE FUNCTION bulk_update_embeddings (
+  updates jsonb
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated_count integer;
+BEGIN
+  UPDATE social_posts AS sp
+  SET
+    -- The JSON array text ('[0.1, 0.2, ...]') is valid pgvector input
+    embedding = u.embedding::vector(768),
+    embedding_model = u.embedding_model
+  FROM jsonb_to_recordset(updates) AS u(id uuid, embedding text, embedding_model text)
+  WHERE sp.id = u.id;
+
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  RETURN updated_count;
+END;
+$$;
@@ -1,19 +1,15 @@
 import sys
-import os
 from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client
 
 # Add project root to sys.path
 root_path = Path(__file__).resolve().parent.parent
 if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
 
+from src.clients import get_supabase_client
+
 def verify_google_trends():
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    supabase = create_client(url, key)
+    supabase = get_supabase_client()
 
     try:
         print("Checking for 'google_trends' table...")
@@ -1,13 +1,19 @@
-import os
+import sys
 import asyncio
 import json
 import uuid
-from supabase import create_client
-from dotenv import load_dotenv
+from pathlib import Path
+
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client, load_env
 from src.ai.search import SemanticSearch
 
 async def verify_logging():
-    load_dotenv()
+    load_env()
     print("--- Verifying Research Query Logging ---")
     
     search_engine = SemanticSearch()
@@ -46,11 +52,12 @@ async def verify_logging():
         metadata={"has_context": True}
     )
     
+    # Logs are written in the background; flush the queue before reading them back
+    await search_engine.log_writer.flush()
+
     print("\n4. Retrieving logs from database...")
     try:
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        supabase = create_client(url, key)
+        supabase = get_supabase_client()
         
         resp = supabase.table("research_logs")\
             .select("*")\
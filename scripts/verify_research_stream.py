@@ -1,3 +1,4 @@
+import time
 import requests
 import json
 
@@ -10,14 +11,24 @@ def test_research_streaming():
     
     print(f"Testing Research Stream: {url}")
     try:
+        started = time.perf_counter()
+        first_chunk_at = None
+        chunks = 0
         with requests.post(url, json=payload, stream=True) as response:
             for line in response.iter_lines():
                 if line:
                     decoded_line = line.decode('utf-8')
                     if decoded_line.startswith("data: "):
                         data = json.loads(decoded_line[6:])
+                        if data.get('phase') == 'synthesis_chunk':
+                            chunks += 1
+                            if first_chunk_at is None:
+                                first_chunk_at = time.perf_counter() - started
+                                print(f"[synthesis_chunk] first chunk after {first_chunk_at:.1f}s")
+                            continue
                         print(f"[{data.get('phase')}] {data.get('status') or data.get('decision') or 'Content received...'}")
                         if data.get('phase') == 'complete':
+                            print(f"\nSynthesis chunks: {chunks}, total time {time.perf_counter() - started:.1f}s")
                             print(f"\nFinal Synthesis (first 100 chars):\n{data.get('content')[:100]}...")
     except Exception as e:
         print(f"Error: {e}")
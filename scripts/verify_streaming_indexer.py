@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+import hashlib
+from pathlib import Path
+
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from scripts.fake_backends import FakeSupabaseClient, bulk_update_rows
+from src.ai.indexer import VectorIndexer, IndexerCheckpoint
+from src.ai.embeddings import EmbeddingProvider
+
+def fake_embeddings(texts):
+    """Deterministic 768-d vectors so the run needs no Gemini quota."""
+    vectors = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        vectors.append([digest[i % len(digest)] / 255.0 for i in range(768)])
+    return vectors
+
+class FlakyProvider(EmbeddingProvider):
+    """
+    Fake Gemini provider: `transient` requests fail once (like a 429), from `outage_at`
+    every request fails, and any batch containing a `rejected` text always fails.
+    """
+    model = "models/text-embedding-004"
+    remote = True
+
+    def __init__(self):
+        self.calls = 0
+        self.transient = set()
+        self.outage_at = None
+        self.rejected = set()
+
+    def embed(self, texts, task_type="retrieval_document"):
+        self.calls += 1
+        if self.calls in self.transient:
+            raise RuntimeError("429 Resource has been exhausted (simulated)")
+        if self.outage_at is not None and self.calls >= self.outage_at:
+            raise RuntimeError("429 Quota exceeded (simulated outage)")
+        if self.rejected & set(texts):
+            raise RuntimeError("400 Request contains an invalid argument (simulated)")
+        return fake_embeddings(texts)
+
+def seed_rows(n=1200):
+    rows = []
+    for i in range(n):
+        rows.append({
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            # Every 25th row has no scrubbed text and must be skipped, not re-read forever
+            "content_scrubbed": None if i % 25 == 0 else f"narrative {i % 97}",
+            "is_anonymized": i % 10 != 0,
+            "platform": "reddit",
+            "embedding": None
+        })
+    return rows
+
+def verify_streaming_indexer():
+    print("--- Verifying Streaming Indexer (offline) ---")
+    os.environ.setdefault("GEMINI_API_KEY", "offline-verification")
+
+    # platform is NOT NULL, so a partial upsert of {id, embedding} would be rejected like on the real table
+    fake = FakeSupabaseClient(
+        tables={"social_posts": seed_rows()},
+        rpc_handlers={"bulk_update_embeddings": lambda client, updates: bulk_update_rows(client, "social_posts", updates)},
+        not_null={"social_posts": ["platform"]}
+    )
+    provider = FlakyProvider()
+    indexer = VectorIndexer(batch_size=50, concurrency=4, rpm=None, supabase=fake, use_cache=False,
+                            provider=provider, max_retries=1)
+
+    state_dir = tempfile.mkdtemp()
+    checkpoint = IndexerCheckpoint(os.path.join(state_dir, "indexer_state.json"))
+
+    # 1. A transient 429 is retried; from the 6th request on the provider is down for good
+    provider.transient = {2}
+    provider.outage_at = 6
+    first = indexer.run_stream(page_size=100, checkpoint=checkpoint)
+    state = checkpoint.load()
+    print(f"1. Interrupted run indexed {first} rows ({indexer.failed_rows} failed), checkpoint: {state}")
+    if not state.get("last_id"):
+        print("FAILED: No checkpoint written before the outage.")
+        return
+    if not indexer.bulk_rpc_available or ("social_posts", "update") in fake.calls:
+        print("FAILED: Embeddings were not written through bulk_update_embeddings.")
+        return
+
+    # 2. Resume: only rows after the checkpoint should be fetched
+    provider.outage_at = None
+    second = indexer.run_stream(page_size=100, checkpoint=checkpoint)
+    print(f"2. Resumed run indexed {second} rows")
+
+    expected = [r for r in fake.tables["social_posts"] if r["is_anonymized"] and r["content_scrubbed"]]
+    missing = [r["id"] for r in expected if r["embedding"] is None]
+    leaked = [r["id"] for r in fake.tables["social_posts"] if not r["is_anonymized"] and r["embedding"]]
+
+    if missing or leaked:
+        print(f"FAILED: {len(missing)} rows left unindexed, {len(leaked)} non-anonymized rows indexed.")
+        return
+    if os.path.exists(checkpoint.path):
+        print("FAILED: Checkpoint was not cleared after a complete walk.")
+        return
+    print(f"SUCCESS: All {len(expected)} eligible rows indexed across an outage and resume.")
+
+    # 3. A row the provider always rejects stops the first max_attempts - 1 runs, then is skipped
+    poison_id = "00000000-0000-0000-0000-000000000501"
+    later_id = "00000000-0000-0000-0000-000000001199a"
+    fake.tables["social_posts"].append({
+        "id": later_id, "content_scrubbed": "narrative after poison",
+        "is_anonymized": True, "platform": "reddit", "embedding": None
+    })
+    poison = next(r for r in fake.tables["social_posts"] if r["id"] == poison_id)
+    poison.update({"content_scrubbed": "rejected narrative", "embedding": None})
+    provider.rejected = {"rejected narrative"}
+    indexer.batch_size = 1
+    blocked = []
+    for _ in range(3):
+        indexer.run_stream(page_size=1, checkpoint=checkpoint, max_attempts=3)
+        later = next(r for r in fake.tables["social_posts"] if r["id"] == later_id)
+        blocked.append(later["embedding"] is None)
+    state = checkpoint.load()
+    print(f"3. Later row still pending after each run: {blocked}, checkpoint: {state}")
+    if blocked != [True, True, False] or state.get("last_id") or state.get("failures", {}).get(poison_id) != 3:
+        print("FAILED: A permanently failing row was not skipped after 3 runs.")
+    else:
+        print("SUCCESS: The poison row was skipped after 3 failed runs and is still reported.")
+
+if __name__ == "__main__":
+    verify_streaming_indexer()
@@ -7,17 +7,17 @@ def test_trends_api():
     print("\n--- Testing Trends API ---")
     # Global Trends
     resp = requests.get(f"{BASE_URL}/api/trends?sg_only=false")
-    data = resp.json().get('data', [])
-    print(f"Global Trends: {len(data)} rows returned")
-    if data:
-        print(f"Sample Global Trend: {data[0]}")
+    data = resp.json()
+    print(f"Global Trends: {len(data.get('labels', []))} dates, keywords: {list(data.get('series', {}))}")
+    if data.get('labels'):
+        print(f"Latest Global Point ({data['labels'][-1]}): {{{', '.join(f'{k}: {v[-1]}' for k, v in data['series'].items())}}}")
 
     # SG Trends
     resp = requests.get(f"{BASE_URL}/api/trends?sg_only=true")
-    data = resp.json().get('data', [])
-    print(f"SG Trends: {len(data)} rows returned")
-    if data:
-        print(f"Sample SG Trend: {data[0]}")
+    data = resp.json()
+    print(f"SG Trends: {len(data.get('labels', []))} dates, keywords: {list(data.get('series', {}))}")
+    if data.get('labels'):
+        print(f"Latest SG Point ({data['labels'][-1]}): {{{', '.join(f'{k}: {v[-1]}' for k, v in data['series'].items())}}}")
 
 def test_search_suggestion():
     print("\n--- Testing Search Suggestion Logic ---")
@@ -1,9 +1,14 @@
-import os
-from supabase import create_client
-from dotenv import load_dotenv
+import sys
+from pathlib import Path
 
-load_dotenv()
-s = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+# Add project root to sys.path
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client
+
+s = get_supabase_client()
 
 print("--- Aggregating Platform Counts (Social Posts) ---")
 # Since we have 55k rows, we'll use a count on each platform ilike query
@@ -8,19 +8,39 @@ from pydantic import BaseModel
 from typing import List, Optional
 import json
 import asyncio
+from contextlib import asynccontextmanager
 
 # Add project root to sys.path for robust imports
 root_path = Path(__file__).resolve().parent.parent.parent
 if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
 
+from src.clients import get_generative_model
 from src.ai.search import SemanticSearch
 
-app = FastAPI(title="Shadee-Intelligence: Internal Brain Explorer")
-
-# Initialize Search Engine
+# Initialize Search Engine (cheap: Supabase/Gemini clients are created on first use)
 search_engine = SemanticSearch()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup/shutdown hook. With APP_WARMUP=1 the Supabase client, Gemini SDK and
+    (for SEARCH_BACKEND=local) the vector index are initialized before the worker
+    accepts traffic; otherwise they load on the first request that needs them.
+    On shutdown, queued research logs are flushed before the I/O pool is released.
+    """
+    if os.getenv("APP_WARMUP", "0").lower() in ("1", "true", "yes"):
+        try:
+            await search_engine.run_blocking(search_engine.warm_up)
+            print("Warm-up complete.")
+        except Exception as e:
+            print(f"Warm-up failed (will retry lazily on first request): {e}")
+    yield
+    await search_engine.log_writer.close()
+    search_engine.close()
+
+app = FastAPI(title="Shadee-Intelligence: Internal Brain Explorer", lifespan=lifespan)
+
 class SearchQuery(BaseModel):
     query: str
     limit: Optional[int] = 12
@@ -52,13 +72,15 @@ class FollowUpRequest(BaseModel):
     context: str
     results: List[SearchResult]
     session_id: str
+    # Stream the answer as SSE 'answer_chunk' events instead of one JSON response
+    stream: Optional[bool] = False
 
 @app.get("/api/debug-db")
 async def debug_db():
     """Diagnostic route to verify Supabase function signature."""
     try:
         # Try a dummy search to see what keys come back
-        results = search_engine.search(query="test", limit=1)
+        results = await search_engine.search_async(query="test", limit=1)
         if not results:
             return {"status": "ok", "message": "Connection works, but no data found to test."}
         
@@ -75,6 +97,11 @@ async def debug_db():
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Diagnostic route exposing hit/miss counters of the in-process caches."""
+    return search_engine.cache_stats()
+
 class ResearchRequest(BaseModel):
     query: str
     sg_only: Optional[bool] = False
@@ -107,10 +134,11 @@ async def follow_up(req: FollowUpRequest):
     """
     Answers a one-turn follow-up question based on the research synthesis context.
     
+    With `stream: true` the answer is sent as SSE: 'answer_chunk' events with
+    incremental text, then a 'complete' event with the full answer.
     The question and AI answer are logged to the database under the current session ID.
     """
-    try:
-        prompt = f"""
+    prompt = f"""
         You are a trained therapy specialist in youth mental health. You just provided a synthesis of narratives for the query "{req.query}".
         
         Original Synthesis:
@@ -120,14 +148,8 @@ async def follow_up(req: FollowUpRequest):
         
         Answer based on the provided narratives and the synthesis context.
         """
-        
-        import google.generativeai as genai
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        response = model.generate_content(prompt)
-        
-        answer = response.text
-        
+
+    async def log_answer(answer):
         # Log follow-up
         if req.session_id:
             await search_engine.log_research_query(
@@ -137,6 +159,29 @@ async def follow_up(req: FollowUpRequest):
                 response=answer,
                 metadata={"has_context": True}
             )
+
+    if req.stream:
+        async def event_generator():
+            try:
+                pieces = []
+                async for piece in search_engine.stream_generation('gemini-2.0-flash-exp', prompt):
+                    pieces.append(piece)
+                    yield f"data: {json.dumps({'phase': 'answer_chunk', 'content': piece})}\n\n"
+                answer = "".join(pieces)
+                yield f"data: {json.dumps({'phase': 'complete', 'answer': answer})}\n\n"
+                await log_answer(answer)
+            except Exception as e:
+                print(f"Follow-up Error: {e}")
+                yield f"data: {json.dumps({'phase': 'error', 'content': 'Error answering follow-up. Please try again.'})}\n\n"
+
+        return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+    try:
+        model = get_generative_model('gemini-2.0-flash-exp')
+        response = await model.generate_content_async(prompt)
+        
+        answer = response.text
+        await log_answer(answer)
             
         return {"answer": answer}
     except Exception as e:
@@ -148,7 +193,7 @@ async def get_stats(ai_only: bool = False, sg_only: bool = False):
     """Get statistics of the internal brain with filters."""
     try:
         region = "Singapore" if sg_only else None
-        count = search_engine.get_total_count(ai_only=ai_only, region=region)
+        count = await search_engine.get_total_count_async(ai_only=ai_only, region=region)
         return {"total_posts": count}
     except Exception as e:
         print(f"Stats Error: {e}")
@@ -160,26 +205,20 @@ async def perform_search(search_query: SearchQuery):
     try:
         region = "Singapore" if search_query.sg_only else None
         
-        # 1. Fetch narratives
-        results = search_engine.search(
+        # 1. Fetch narratives (Verified filter is applied server-side)
+        results = await search_engine.search_async(
             query=search_query.query,
             threshold=search_query.threshold,
-            limit=search_query.limit * 2 if search_query.ai_only else search_query.limit,
-            region=region
+            limit=search_query.limit,
+            region=region,
+            ai_only=search_query.ai_only
         )
-        
-        # Apply AI-only filter if requested
-        if search_query.ai_only and results:
-            results = [r for r in results if isinstance(r, dict) and r.get('ai_explanation')]
-            results = results[:search_query.limit]
-        elif results:
-            results = results[:search_query.limit]
 
         # 2. Add Trend Context / Suggestions
         suggestion = None
         trend_keyword = None
         if results is None or len(results) < 5:
-            trend_keyword = search_engine.map_query_to_trend(search_query.query)
+            trend_keyword = await search_engine.map_query_to_trend_async(search_query.query)
             if trend_keyword:
                 loc = "Singapore" if search_query.sg_only else "the world"
                 suggestion = f"Narrative evidence for '{search_query.query}' is sparse, but Google searches for '{trend_keyword}' in {loc} are showing activity. Explore broader trends?"
@@ -195,17 +234,20 @@ async def perform_search(search_query: SearchQuery):
 
 @app.get("/api/trends")
 async def get_trends(sg_only: bool = False):
-    """Get summarized trend data for the dashboard chart."""
+    """
+    Get chart-ready trend series for the dashboard:
+    {"labels": [dates], "series": {keyword: [score or null per date]}}.
+    """
     try:
         region = "Singapore" if sg_only else "Global"
-        data = search_engine.get_trends_data(region=region)
+        data = await search_engine.get_trend_series_async(region=region)
         # Fallback to Global if SG is empty to show something useful
-        if not data and sg_only:
-            data = search_engine.get_trends_data(region="Global")
-        return {"data": data}
+        if not data["labels"] and sg_only:
+            data = await search_engine.get_trend_series_async(region="Global")
+        return data
     except Exception as e:
         print(f"Trends API Error: {e}")
-        return {"data": []}
+        return {"labels": [], "series": {}}
 
 # Serve Static Files
 app.mount("/", StaticFiles(directory="src/ai/static", html=True), name="static")
@@ -0,0 +1,301 @@
+import time
+import asyncio
+import threading
+from functools import partial
+from collections import OrderedDict
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries expire after `ttl` seconds.
+
+    Thread-safe, so it can be shared between FastAPI handlers and worker
+    threads. get_or_load / get_or_load_async coalesce concurrent misses for
+    one key into a single load. Hit/miss counters are kept for the
+    diagnostics endpoint.
+
+    Args:
+        maxsize: Maximum number of entries before the least recently used is dropped.
+        ttl: Entry lifetime in seconds (None keeps entries until evicted by size).
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Callers that waited on another caller's load instead of loading themselves
+        self.coalesced = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+
+    _MISSING = object()
+
+    def _lookup(self, key):
+        """Live value for `key` or _MISSING, counting the hit/miss. Call with the lock held."""
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return self._MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is self._MISSING else value
+
+    def get_or_load(self, key, loader, should_cache=None):
+        """
+        Returns the cached value for `key`, calling `loader()` on a miss. Concurrent
+        misses for the same key wait for one load instead of each calling `loader`.
+
+        Args:
+            key: Cache key.
+            loader: Zero-argument callable producing the value; its exceptions reach
+                every waiting caller and nothing is cached.
+            should_cache: Optional predicate; values it rejects are returned but not stored.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not self._MISSING:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.wait()
+        try:
+            flight.value = loader()
+            if should_cache is None or should_cache(flight.value):
+                self.set(key, flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def get_or_load_async(self, key, loader, should_cache=None):
+        """Async get_or_load: `loader` is a coroutine function; waiters await the same task."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is not self._MISSING:
+                return value
+            task = self._async_flights.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = self._async_flights[key] = asyncio.ensure_future(loader())
+                task.add_done_callback(partial(self._finish_async_flight, key, should_cache=should_cache))
+        # shield: one caller being cancelled (client disconnect) must not cancel the others' load
+        return await asyncio.shield(task)
+
+    def _finish_async_flight(self, key, task, should_cache=None):
+        with self._lock:
+            if self._async_flights.get(key) is task:
+                del self._async_flights[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        if should_cache is None or should_cache(value):
+            self.set(key, value)
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size, hits, misses, coalesced = len(self._data), self.hits, self.misses, self.coalesced
+        lookups = hits + misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+class RefreshAheadCache:
+    """
+    Stale-while-revalidate cache for slow, frequently read values (e.g. banner counts).
+
+    Entries younger than `ttl` are served as-is. Older entries are still served
+    immediately while a single background refresh per key reloads them, so
+    readers never wait on the database once a key is warm. Entries older than
+    `max_staleness` are never served: the caller loads synchronously instead,
+    and concurrent callers for a cold key share that one load. A failed
+    background refresh keeps the previous value (until max_staleness).
+
+    Args:
+        ttl: Seconds after which an entry is refreshed in the background.
+        max_staleness: Hard upper bound, in seconds, on the age of a served value.
+        executor: Optional executor for background refreshes (a daemon thread otherwise).
+    """
+    MISSING = object()
+
+    def __init__(self, ttl: float = 60, max_staleness: float = 300, executor=None):
+        self.ttl = ttl
+        self.max_staleness = max(max_staleness, ttl)
+        self.executor = executor
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.coalesced = 0
+        self._data = {}
+        self._refreshing = set()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key, loader):
+        """
+        Non-blocking read: returns the cached value or RefreshAheadCache.MISSING.
+        Schedules a background refresh through `loader` when the entry is past its TTL.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return self.MISSING
+            value, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age > self.max_staleness:
+                self.misses += 1
+                return self.MISSING
+            if age <= self.ttl:
+                self.hits += 1
+                return value
+            self.stale_hits += 1
+            schedule = key not in self._refreshing
+            if schedule:
+                self._refreshing.add(key)
+        if schedule:
+            self._schedule(key, loader)
+        return value
+
+    def load(self, key, loader):
+        """
+        Blocking read-through: calls `loader()`, stores and returns its value.
+        Callers arriving while a load for `key` is running wait for its result.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.wait()
+        try:
+            flight.value = loader()
+            self.set(key, flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def get(self, key, loader):
+        value = self.lookup(key, loader)
+        if value is self.MISSING:
+            return self.load(key, loader)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+
+    def invalidate(self, key=None):
+        """Drops one key (or every key when None) so the next read reloads it."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def _schedule(self, key, loader):
+        if self.executor is not None:
+            self.executor.submit(self._refresh, key, loader)
+        else:
+            threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            with self._lock:
+                self._data[key] = (value, time.monotonic())
+                self.refreshes += 1
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"Background refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {
+                "size": len(self._data),
+                "ttl": self.ttl,
+                "max_staleness": self.max_staleness,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors
+            }
+        lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+        counters["hit_rate"] = round((counters["hits"] + counters["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return counters
@@ -0,0 +1,128 @@
+import re
+
+# Rough chars-per-token ratio for English social text (Gemini tokenizer averages ~4)
+CHARS_PER_TOKEN = 4
+_WORD_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting (no tokenizer round-trip)."""
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to roughly `max_tokens`, backing off to a word boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + " [...]"
+
+def shingles(text: str, size: int = 3) -> frozenset:
+    """Word n-gram set used for near-duplicate detection when no embedding is available."""
+    words = _WORD_PATTERN.findall(text.casefold())
+    if len(words) < size:
+        return frozenset([" ".join(words)])
+    return frozenset(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class ContextBuilder:
+    """
+    Packs retrieved narratives into a synthesis prompt under a token budget.
+
+    Narratives are taken in the order given (most similar first, i.e. highest
+    value first). Each is truncated to `max_tokens_per_narrative`, skipped if it
+    is a near-duplicate of one already packed, and added while the running total
+    stays within `token_budget`. Near-duplicates are detected by cosine similarity
+    of unit-norm embeddings when they are supplied, otherwise by Jaccard overlap of
+    word 3-gram shingles. The context string is assembled with a single join.
+
+    Args:
+        token_budget: Maximum estimated tokens for all packed narratives.
+        max_tokens_per_narrative: Per-narrative truncation limit.
+        embedding_threshold: Cosine similarity at or above which two narratives are duplicates.
+        shingle_threshold: Jaccard overlap at or above which two narratives are duplicates.
+    """
+    def __init__(self, token_budget: int = 50000, max_tokens_per_narrative: int = 400,
+                 embedding_threshold: float = 0.97, shingle_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.max_tokens_per_narrative = max_tokens_per_narrative
+        self.embedding_threshold = embedding_threshold
+        self.shingle_threshold = shingle_threshold
+
+    def _is_duplicate(self, text_key, shingle_set, vector, seen_texts, kept_shingles, kept_vectors):
+        if text_key in seen_texts:
+            return True
+        if vector is not None:
+            import numpy as np
+            return bool(kept_vectors) and float(np.max(np.stack(kept_vectors) @ vector)) >= self.embedding_threshold
+        for other in kept_shingles:
+            # Jaccard can't reach the threshold if the set sizes are too different
+            if min(len(other), len(shingle_set)) < self.shingle_threshold * max(len(other), len(shingle_set)):
+                continue
+            if jaccard(shingle_set, other) >= self.shingle_threshold:
+                return True
+        return False
+
+    def build(self, narratives: list, embeddings: list = None):
+        """
+        Returns (context, stats). `embeddings`, if given, is aligned with `narratives`
+        (entries may be None) and should be unit-norm.
+
+        stats: {"candidates", "packed", "dropped", "duplicates", "over_budget",
+                "truncated", "tokens", "budget"}
+        """
+        import numpy as np
+
+        parts = []
+        seen_texts = set()
+        kept_shingles = []
+        kept_vectors = []
+        tokens = duplicates = over_budget = truncated = 0
+
+        for i, row in enumerate(narratives or []):
+            content = row.get('content_scrubbed') or row.get('content') or "No content"
+            text_key = " ".join(content.split()).casefold()
+            vector = embeddings[i] if embeddings is not None and i < len(embeddings) else None
+            if vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+            shingle_set = shingles(content) if vector is None else None
+
+            if self._is_duplicate(text_key, shingle_set, vector, seen_texts, kept_shingles, kept_vectors):
+                duplicates += 1
+                continue
+
+            clipped = truncate_to_tokens(content, self.max_tokens_per_narrative)
+            entry = f"Narrative {len(parts) + 1}: {clipped}\n\n"
+            cost = estimate_tokens(entry)
+            if tokens + cost > self.token_budget:
+                over_budget += 1
+                continue
+
+            if clipped != content:
+                truncated += 1
+            parts.append(entry)
+            tokens += cost
+            seen_texts.add(text_key)
+            if vector is not None:
+                kept_vectors.append(vector)
+            else:
+                kept_shingles.append(shingle_set)
+
+        candidates = len(narratives or [])
+        stats = {
+            "candidates": candidates,
+            "packed": len(parts),
+            "dropped": candidates - len(parts),
+            "duplicates": duplicates,
+            "over_budget": over_budget,
+            "truncated": truncated,
+            "tokens": tokens,
+            "budget": self.token_budget
+        }
+        return "".join(parts), stats
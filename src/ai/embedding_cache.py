@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed store for document embeddings (SQLite).
+
+    Entries are keyed by sha256(model + task_type + text), so reposts and
+    copy-pasta narratives that scrub to the same `content_scrubbed` are only
+    ever embedded once per model. Vectors are stored as packed float32 blobs.
+
+    Args:
+        path: SQLite file location (defaults to .cache/embeddings.sqlite3).
+        max_bytes: Optional size budget for stored vectors; least recently used
+            entries are evicted once it is exceeded.
+    """
+    def __init__(self, path: str = None, max_bytes: int = None):
+        self.path = path or os.path.join(".cache", "embeddings.sqlite3")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str, task_type: str) -> str:
+        payload = f"{model}\x1f{task_type}\x1f{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, texts: list, model: str, task_type: str) -> dict:
+        """
+        Looks up cached vectors for `texts`.
+
+        Returns {text: embedding} for the texts that were found; hit/miss
+        counters are updated per unique text.
+        """
+        unique = list(dict.fromkeys(t for t in texts if t))
+        if not unique:
+            return {}
+        keys = {self.make_key(t, model, task_type): t for t in unique}
+
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = array("f", blob).tolist()
+
+                hit_keys = [key for key, _ in rows]
+                if hit_keys:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [time.time(), *hit_keys]
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: dict, model: str, task_type: str):
+        """Stores {text: embedding} pairs, then enforces the size budget."""
+        now = time.time()
+        rows = [
+            (self.make_key(text, model, task_type), model, array("f", embedding).tobytes(), now)
+            for text, embedding in items.items()
+            if text and embedding
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        if self.max_bytes:
+            self.evict(self.max_bytes)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        return total
+
+    def evict(self, max_bytes: int) -> int:
+        """Deletes least recently used entries until stored vectors fit in `max_bytes`."""
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+
+            cursor = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC")
+            stale = []
+            for key, size in cursor:
+                if total <= max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+            self._conn.commit()
+            evicted = len(stale)
+        print(f"Embedding cache evicted {evicted} entries (budget: {max_bytes} bytes).")
+        return evicted
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self) -> str:
+        return (f"Embedding cache: {self.hits} hits / {self.misses} misses "
+                f"({self.hit_rate:.1%} hit rate), {self.size_bytes() / 1024 / 1024:.1f} MB stored")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
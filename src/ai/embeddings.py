@@ -0,0 +1,162 @@
+"""
+Embedding providers shared by the indexer and the search engine.
+
+Every vector written to `social_posts.embedding` is tagged with the provider's
+`name` in `social_posts.embedding_model` (scripts/phase5_embedding_model.sql),
+and every search filters on it, so vectors from different models are never
+compared.
+
+Providers:
+    gemini  Gemini text-embedding-004 over the API (default, rate limited by quota)
+    local   sentence-transformers model run on CPU (default all-mpnet-base-v2,
+            768-d like Gemini, so it fits the existing vector(768) column).
+            Needs `pip install sentence-transformers`.
+
+Selected with EMBEDDING_PROVIDER; the local model with EMBEDDING_LOCAL_MODEL,
+EMBEDDING_LOCAL_BACKEND ('torch' or 'onnx'), EMBEDDING_LOCAL_BATCH_SIZE and
+EMBEDDING_LOCAL_THREADS.
+"""
+import os
+import asyncio
+import threading
+from functools import partial
+
+# Column type of social_posts.embedding
+EMBEDDING_DIM = 768
+# Model of every row embedded before embedding_model existed (backfilled by the phase5 migration)
+LEGACY_EMBEDDING_MODEL = "text-embedding-004"
+
+_lock = threading.Lock()
+_providers = {}
+
+def schema_lacks_model_column(error) -> bool:
+    """True if a Supabase error means the phase5 migration (embedding_model / filter_model) isn't applied."""
+    message = str(error)
+    return ("embedding_model" in message or "filter_model" in message) and (
+        "PGRST" in message or "does not exist" in message or "Could not find" in message
+    )
+
+class EmbeddingProvider:
+    """
+    Interface for an embedding backend.
+
+    Attributes:
+        model: Identifier passed to the backend (also used in embedding-cache keys).
+        name: Tag stored in social_posts.embedding_model and used to filter searches.
+        dim: Vector length.
+        remote: True if calls go over a rate-limited API (the indexer throttles those).
+    """
+    model = None
+    dim = EMBEDDING_DIM
+    remote = False
+
+    @property
+    def name(self) -> str:
+        return self.model.rsplit("/", 1)[-1]
+
+    @property
+    def legacy(self) -> bool:
+        """Whether this provider produced the rows written before embedding_model existed."""
+        return self.name == LEGACY_EMBEDDING_MODEL
+
+    def embed(self, texts: list, task_type: str = "retrieval_document") -> list:
+        """Returns one vector per text. Raises on failure."""
+        raise NotImplementedError
+
+    async def embed_async(self, texts: list, task_type: str = "retrieval_document") -> list:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self.embed, texts, task_type))
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Gemini embeddings with task-specific query/document modes (up to 100 texts per request)."""
+    remote = True
+
+    def __init__(self, model: str = "models/text-embedding-004"):
+        self.model = model
+
+    def embed(self, texts: list, task_type: str = "retrieval_document") -> list:
+        from src.clients import configure_gemini
+        genai = configure_gemini()
+        result = genai.embed_content(model=self.model, content=list(texts), task_type=task_type)
+        return result['embedding']
+
+    async def embed_async(self, texts: list, task_type: str = "retrieval_document") -> list:
+        from src.clients import configure_gemini
+        genai = configure_gemini()
+        result = await genai.embed_content_async(model=self.model, content=list(texts), task_type=task_type)
+        return result['embedding']
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU-only sentence-transformers model, loaded on first use.
+
+    A batch is encoded by one call that spreads the matrix work over all cores
+    (`threads` intra-op threads), so callers should send large batches rather
+    than many concurrent small ones. Vectors are returned L2-normalized.
+    The model is symmetric, so `task_type` is ignored.
+
+    Args:
+        model: sentence-transformers model id or local path.
+        backend: 'torch' or 'onnx' (ONNX Runtime; needs sentence-transformers>=3.2 and optimum).
+        batch_size: Texts per forward pass.
+        threads: CPU threads used by the model (defaults to every core).
+    """
+    def __init__(self, model: str = "sentence-transformers/all-mpnet-base-v2", backend: str = "torch",
+                 batch_size: int = 64, threads: int = None):
+        self.model = model
+        self.backend = backend
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count()
+        self._encoder = None
+        self._load_lock = threading.Lock()
+
+    def _get_encoder(self):
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    try:
+                        import torch
+                        from sentence_transformers import SentenceTransformer
+                    except ImportError:
+                        raise ImportError("The local embedding provider needs sentence-transformers: "
+                                          "pip install sentence-transformers")
+                    torch.set_num_threads(self.threads)
+                    kwargs = {"device": "cpu"}
+                    if self.backend != "torch":
+                        kwargs["backend"] = self.backend
+                    encoder = SentenceTransformer(self.model, **kwargs)
+                    self.dim = encoder.get_sentence_embedding_dimension()
+                    if self.dim != EMBEDDING_DIM:
+                        print(f"Warning: {self.model} produces {self.dim}-d vectors but "
+                              f"social_posts.embedding is vector({EMBEDDING_DIM}).")
+                    self._encoder = encoder
+        return self._encoder
+
+    def embed(self, texts: list, task_type: str = "retrieval_document") -> list:
+        vectors = self._get_encoder().encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        )
+        return vectors.tolist()
+
+def get_embedding_provider(name: str = None) -> EmbeddingProvider:
+    """Returns the process-wide provider for `name` (defaults to EMBEDDING_PROVIDER, else 'gemini')."""
+    name = (name or os.getenv("EMBEDDING_PROVIDER") or "gemini").lower()
+    provider = _providers.get(name)
+    if provider is None:
+        with _lock:
+            provider = _providers.get(name)
+            if provider is None:
+                if name == "gemini":
+                    provider = GeminiEmbeddingProvider()
+                elif name == "local":
+                    provider = LocalEmbeddingProvider(
+                        model=os.getenv("EMBEDDING_LOCAL_MODEL", "sentence-transformers/all-mpnet-base-v2"),
+                        backend=os.getenv("EMBEDDING_LOCAL_BACKEND", "torch").lower(),
+                        batch_size=int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", "64")),
+                        threads=int(os.getenv("EMBEDDING_LOCAL_THREADS", "0")) or None
+                    )
+                else:
+                    raise ValueError(f"Unknown embedding provider: {name} (expected 'gemini' or 'local')")
+                _providers[name] = provider
+    return provider
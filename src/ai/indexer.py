@@ -1,50 +1,332 @@
 import os
-import google.generativeai as genai
-from supabase import create_client, Client
-from dotenv import load_dotenv
+import sys
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from supabase import Client
+
+# Add project root to sys.path for robust imports
+root_path = Path(__file__).resolve().parent.parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import load_env, get_supabase_client, configure_gemini
+from src.ai.embedding_cache import EmbeddingCache
+from src.ai.research_cache import ResearchCache
+from src.ai.embeddings import EmbeddingProvider, get_embedding_provider, schema_lacks_model_column
+
+class RateLimiter:
+    """
+    Thread-safe requests-per-minute budget shared by all embedding workers.
+
+    Each call to acquire() reserves the next free slot on an evenly spaced
+    schedule (60 / rpm seconds apart) and sleeps until that slot arrives.
+    """
+    def __init__(self, rpm: int = None):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
+class IndexerCheckpoint:
+    """
+    Persists the keyset cursor of a streaming indexer run to a local JSON file.
+
+    The cursor is the last `social_posts.id` whose page has been fully written
+    back, so a restarted run resumes strictly after committed work. Alongside it,
+    `failures` counts the runs in which each still-failing row failed, so rows that
+    can never be indexed are eventually skipped. Writes go through a temp file +
+    os.replace so a crash never leaves a torn state file.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(".cache", "indexer_state.json")
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Checkpoint read error ({self.path}): {e}")
+            return {}
+
+    def save(self, last_id: str, indexed: int, failures: dict = None):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        state = {
+            "last_id": last_id,
+            "indexed": indexed,
+            "failures": failures or {},
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self, failures: dict = None):
+        """Resets the cursor; failure counts are kept so skipped rows stay skipped on the next walk."""
+        if failures:
+            self.save(None, 0, failures)
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
 
 class VectorIndexer:
-    def __init__(self):
-        load_dotenv()
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    def __init__(self, batch_size=100, concurrency=4, rpm=1500, supabase: Client = None,
+                 cache: EmbeddingCache = None, use_cache=True, research_cache: ResearchCache = None,
+                 provider: EmbeddingProvider = None, reembed=False, max_retries=4):
+        """
+        Args:
+            batch_size: Texts sent per embedding request (Gemini accepts up to 100).
+            concurrency: Number of embedding batches kept in flight at once.
+            rpm: Requests-per-minute budget for the embedding API (None/0 disables throttling).
+            supabase: Optional pre-built client (e.g. a fake for offline runs).
+            cache: Content-addressed embedding store (defaults to .cache/embeddings.sqlite3,
+                capped at EMBEDDING_CACHE_MAX_BYTES).
+            use_cache: Set False to always call the embedding API.
+            research_cache: Recorded research runs to invalidate when new rows are indexed
+                (defaults to .cache/research.sqlite3, opened on first write).
+            provider: Embedding backend (defaults to EMBEDDING_PROVIDER, see src/ai/embeddings.py).
+            reembed: Also pick up rows embedded by a different model, to move the corpus to this one.
+            max_retries: Extra attempts for a failed embedding request (exponential backoff,
+                every attempt takes a slot from the rpm budget).
+        """
+        load_env()
+        self.provider = provider or get_embedding_provider()
         self.gemini_key = os.getenv("GEMINI_API_KEY")
         
-        if not self.gemini_key:
+        if self.provider.remote and not self.gemini_key:
             raise ValueError("GEMINI_API_KEY must be set for indexing.")
             
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
-        genai.configure(api_key=self.gemini_key)
-        self.model = "models/text-embedding-004"
+        self.supabase = supabase or get_supabase_client()
+        if self.provider.remote:
+            configure_gemini()
+        self.model = self.provider.model
+        self.batch_size = batch_size
+        # A local model already uses every core for one batch; concurrent batches would only contend
+        self.concurrency = concurrency if self.provider.remote else 1
+        self.rate_limiter = RateLimiter(rpm if self.provider.remote else None)
+        self.reembed = reembed
+        self.max_retries = max_retries
+        # Cleared if scripts/phase6_bulk_update_embeddings.sql is not applied
+        self.bulk_rpc_available = True
+        self.failed_rows = 0
+        # Cleared if the database predates the embedding_model column (phase5 migration)
+        self.model_column_available = True
+        self.task_type = "retrieval_document"
+        if use_cache and cache is None:
+            # 0 = unbounded; otherwise least recently used vectors are evicted past this size
+            cache = EmbeddingCache(max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", "0")) or None)
+        self.cache = cache if use_cache else None
+        self.research_cache = research_cache
 
     def get_embedding(self, text: str):
         """
         Generates a 768-dimensional vector embedding for the given text.
         
-        Uses Gemini's 'text-embedding-004' model configured for 'retrieval_document'.
+        Uses the configured provider (Gemini 'text-embedding-004' by default) in 'retrieval_document' mode.
+        Returns None if the provider keeps failing.
         """
         if not text:
             return None
         try:
-            result = genai.embed_content(
-                model=self.model,
-                content=text,
-                task_type="retrieval_document"
-            )
-            return result['embedding']
+            return self.get_embeddings([text])[0]
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
 
+    def get_embeddings(self, texts: list):
+        """
+        Generates embeddings for a list of texts in a single provider call.
+
+        Texts already present in the embedding cache (and duplicates within the
+        batch) are not sent to the API. A failed request (e.g. 429 / quota) is
+        retried up to `max_retries` times with exponential backoff, each attempt
+        waiting for its own rate-limiter slot. Returns a list aligned with
+        `texts`; raises the last error once the retries are exhausted.
+        """
+        if not texts:
+            return []
+
+        cached = self.cache.get_many(texts, self.model, self.task_type) if self.cache else {}
+        pending = list(dict.fromkeys(t for t in texts if t not in cached))
+
+        if pending:
+            vectors = self._embed_with_retry(pending)
+            fresh = dict(zip(pending, vectors))
+            if self.cache:
+                self.cache.put_many(fresh, self.model, self.task_type)
+            cached.update(fresh)
+
+        return [cached.get(t) for t in texts]
+
+    def _embed_with_retry(self, texts: list):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.provider.embed(texts, task_type=self.task_type)
+            except ImportError:
+                raise
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = 1.0 * (2 ** attempt)
+                print(f"Embedding request failed ({e}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})...")
+                time.sleep(delay)
+
+    def _write_embeddings(self, records: list):
+        """
+        Writes a batch of {id, embedding, embedding_model} records in one request via the
+        UPDATE-only bulk_update_embeddings RPC (scripts/phase6_bulk_update_embeddings.sql).
+
+        Falls back to row-level updates if the RPC is missing or the bulk request fails.
+        Returns (rows written, ids that could not be written). Ids deleted since
+        they were read are neither written nor failed.
+        """
+        if self.bulk_rpc_available and self.model_column_available:
+            try:
+                resp = self.supabase.rpc("bulk_update_embeddings", {"updates": records}).execute()
+                written = resp.data if isinstance(resp.data, int) else len(records)
+                if written != len(records):
+                    print(f"Bulk write updated {written}/{len(records)} rows (the rest no longer exist).")
+                return written, []
+            except Exception as e:
+                if self._handle_missing_model_column(e):
+                    pass
+                elif "PGRST202" in str(e) or "Could not find the function" in str(e):
+                    print("bulk_update_embeddings RPC not found; run scripts/phase6_bulk_update_embeddings.sql. "
+                          "Falling back to row-level updates.")
+                    self.bulk_rpc_available = False
+                else:
+                    print(f"Bulk write failed ({e}), falling back to row-level updates...")
+
+        written = 0
+        failed = []
+        for record in records:
+            try:
+                written += self._write_row(record)
+            except Exception as e:
+                if not self._handle_missing_model_column(e):
+                    print(f"Error updating embedding for {record['id']}: {e}")
+                    failed.append(record["id"])
+                    continue
+                try:
+                    written += self._write_row(record)
+                except Exception as retry_error:
+                    print(f"Error updating embedding for {record['id']}: {retry_error}")
+                    failed.append(record["id"])
+        return written, failed
+
+    def _write_row(self, record: dict) -> int:
+        """Row-level UPDATE of one record; returns 1 if the row still exists."""
+        values = {k: v for k, v in record.items() if k != "id"}
+        if not self.model_column_available:
+            values.pop("embedding_model", None)
+        resp = self.supabase.table("social_posts")\
+            .update(values)\
+            .eq("id", record["id"])\
+            .execute()
+        return 1 if resp.data else 0
+
+    def _handle_missing_model_column(self, error) -> bool:
+        """True if `error` means the phase5 column is missing and writes should continue untagged."""
+        if not self.model_column_available or not schema_lacks_model_column(error):
+            return False
+        if not self.provider.legacy:
+            raise RuntimeError(f"social_posts.embedding_model is missing; apply "
+                               f"scripts/phase5_embedding_model.sql before indexing with {self.provider.name}") from error
+        # Pre-migration database: every vector is text-embedding-004 anyway
+        print("embedding_model column not found, writing untagged vectors (apply scripts/phase5_embedding_model.sql).")
+        self.model_column_available = False
+        return True
+
+    def _embed_batch(self, batch: list):
+        """Embeds one batch into write records; raises if the provider keeps failing."""
+        texts = [row["content_scrubbed"] for row in batch]
+        embeddings = self.get_embeddings(texts)
+        return [
+            {"id": row["id"], "embedding": embedding, "embedding_model": self.provider.name}
+            for row, embedding in zip(batch, embeddings)
+            if embedding
+        ]
+
+    def index_rows(self, rows: list):
+        """
+        Embeds and writes back the given rows through the batched pipeline.
+
+        Returns the number of rows successfully indexed. Rows whose batch could
+        not be embedded (after retries) or written are counted in `failed_rows`.
+        """
+        return self._index_rows(rows)[0]
+
+    def _index_rows(self, rows: list):
+        """
+        Embedding batches run concurrently (bounded by `concurrency`), while
+        completed batches are written from the calling thread as they arrive.
+        Returns (rows indexed, ids of rows that failed).
+        """
+        # For RAG, we skip empty content
+        indexable = [row for row in rows if row.get("content_scrubbed")]
+        batches = [indexable[i:i + self.batch_size] for i in range(0, len(indexable), self.batch_size)]
+
+        success_count = 0
+        failed_ids = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self._embed_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    records = future.result()
+                except Exception as e:
+                    batch = futures[future]
+                    print(f"Embedding batch of {len(batch)} rows failed after {self.max_retries} retries: {e}")
+                    failed_ids.extend(row["id"] for row in batch)
+                    continue
+                if records:
+                    written, failed = self._write_embeddings(records)
+                    success_count += written
+                    failed_ids.extend(failed)
+                    print(f"Indexed {success_count} rows...")
+        if failed_ids:
+            self.failed_rows += len(failed_ids)
+            print(f"{len(failed_ids)} rows failed to index ({self.failed_rows} so far).")
+        if success_count:
+            self.invalidate_research_cache()
+        return success_count, failed_ids
+
+    def invalidate_research_cache(self):
+        """New embeddings can change any research sample, so recorded research runs are dropped."""
+        try:
+            if self.research_cache is None:
+                self.research_cache = ResearchCache()
+            removed = self.research_cache.invalidate()
+            if removed:
+                print(f"Invalidated {removed} cached research runs.")
+        except Exception as e:
+            print(f"Research cache invalidation error: {e}")
+
     def run_batch(self, limit=100):
         print(f"--- Starting Embedding Generation (Limit: {limit}) ---")
         
         # 1. Fetch rows that are anonymized but have no embedding
         try:
-            resp = self.supabase.table("social_posts")\
-                .select("id, content_scrubbed")\
-                .eq("is_anonymized", True)\
-                .is_("embedding", "null")\
+            resp = self._pending_query()\
                 .limit(limit)\
                 .execute()
             
@@ -55,34 +337,137 @@ class VectorIndexer:
 
             print(f"Found {len(rows)} rows to index.")
             
-            # 2. Process and update
-            success_count = 0
-            for row in rows:
-                text = row.get("content_scrubbed")
-                if not text:
-                    # If content is empty/null, we still mark it as indexed with a dummy or skip
-                    # For RAG, we skip empty content
-                    continue
-                
-                embedding = self.get_embedding(text)
-                if embedding:
-                    try:
-                        self.supabase.table("social_posts")\
-                            .update({"embedding": embedding})\
-                            .eq("id", row["id"])\
-                            .execute()
-                        success_count += 1
-                        if success_count % 10 == 0:
-                            print(f"Indexed {success_count} rows...")
-                    except Exception as e:
-                        print(f"Error updating embedding for {row['id']}: {e}")
-            
-            print(f"Indexing complete. Total successful: {success_count}/{len(rows)}")
+            # 2. Embed in concurrent batches and bulk-write the vectors
+            started = time.perf_counter()
+            success_count = self.index_rows(rows)
+            elapsed = time.perf_counter() - started
+            rate = success_count / elapsed if elapsed > 0 else 0.0
+
+            print(f"Indexing complete. Total successful: {success_count}/{len(rows)} "
+                  f"in {elapsed:.1f}s ({rate:.1f} rows/sec), failed: {self.failed_rows}")
+            if self.cache:
+                print(self.cache.report())
             
         except Exception as e:
             print(f"Fatal error in indexer: {e}")
 
+    def _pending_query(self):
+        """Anonymized rows without an embedding (with reembed: or embedded by another model)."""
+        query = self.supabase.table("social_posts")\
+            .select("id, content_scrubbed")\
+            .eq("is_anonymized", True)
+        if self.reembed:
+            return query.or_(f"embedding.is.null,embedding_model.is.null,embedding_model.neq.{self.provider.name}")
+        return query.is_("embedding", "null")
+
+    def iter_pending(self, after_id: str = None, page_size=500):
+        """
+        Yields pages of pending rows (anonymized, no embedding) in `id` order.
+
+        Pages are fetched by keyset cursor (`id > last seen id`) rather than
+        offset, so rows that stay pending (e.g. empty content) never cause the
+        same page to be re-read and the walk covers the whole table.
+        """
+        cursor = after_id
+        while True:
+            query = self._pending_query()
+            if cursor:
+                query = query.gt("id", cursor)
+
+            rows = query.order("id").limit(page_size).execute().data
+            if not rows:
+                return
+
+            yield rows
+            cursor = rows[-1]["id"]
+            if len(rows) < page_size:
+                return
+
+    def run_stream(self, page_size=500, checkpoint: IndexerCheckpoint = None, resume=True, max_attempts=3):
+        """
+        Walks the full pending backlog page by page, checkpointing after each page.
+
+        Args:
+            page_size: Rows fetched per keyset page.
+            checkpoint: Where the cursor is persisted (defaults to .cache/indexer_state.json).
+            resume: Continue after the saved cursor instead of starting from the first id.
+            max_attempts: Runs in which a row may fail before it is skipped.
+
+        The checkpoint only advances to the last id before the first row of the
+        page that failed to embed or write. A page with failures stops the run and
+        leaves the checkpoint there, so a re-run retries those rows. A row that has
+        failed in `max_attempts` runs (e.g. content the provider rejects) no longer
+        stops the run: it is reported, skipped and stays pending, and its count is
+        kept in the checkpoint until it indexes. The cursor is reset once the walk
+        reaches the end of the table, since newly ingested rows may have ids
+        anywhere in the keyspace.
+        Returns the number of rows indexed in this run.
+        """
+        checkpoint = checkpoint or IndexerCheckpoint()
+        saved = checkpoint.load()
+        state = saved if resume else {}
+        cursor = state.get("last_id")
+        total_indexed = state.get("indexed", 0)
+        # Attempt counts belong to rows, not to the cursor, so they survive resume=False
+        failures = dict(saved.get("failures") or {})
+        skipped = []
+
+        print(f"--- Starting Streaming Embedding Generation (Page size: {page_size}, Model: {self.provider.name}) ---")
+        if cursor:
+            print(f"Resuming after id {cursor} ({total_indexed} rows indexed previously).")
+
+        run_indexed = 0
+        started = time.perf_counter()
+        try:
+            for page in self.iter_pending(after_id=cursor, page_size=page_size):
+                indexed, failed_ids = self._index_rows(page)
+                run_indexed += indexed
+                total_indexed = state.get("indexed", 0) + run_indexed
+
+                failed = set(failed_ids)
+                for row in page:
+                    if row["id"] in failed:
+                        failures[row["id"]] = failures.get(row["id"], 0) + 1
+                    else:
+                        failures.pop(row["id"], None)
+
+                blocking = {row_id for row_id in failed if failures[row_id] < max_attempts}
+                if blocking:
+                    first_failed = next(i for i, row in enumerate(page) if row["id"] in blocking)
+                    if first_failed:
+                        cursor = page[first_failed - 1]["id"]
+                    # Nothing before the first failure in this page: keep the previous cursor
+                    checkpoint.save(cursor, total_indexed, failures)
+                    print(f"Stopping: {len(failed_ids)} rows in the page starting at {page[0]['id']} failed. "
+                          f"Checkpoint kept at {cursor or 'the start'}; re-run to retry them.")
+                    return run_indexed
+                if failed:
+                    skipped.extend(sorted(failed))
+                    print(f"Skipping {len(failed)} rows that failed in {max_attempts} runs "
+                          f"(e.g. {sorted(failed)[0]}); they stay pending.")
+
+                cursor = page[-1]["id"]
+                checkpoint.save(cursor, total_indexed, failures)
+
+                elapsed = time.perf_counter() - started
+                rate = run_indexed / elapsed if elapsed > 0 else 0.0
+                print(f"Committed page ending at {cursor} "
+                      f"({run_indexed} rows this run, {rate:.1f} rows/sec)")
+        except Exception as e:
+            print(f"Fatal error in streaming indexer: {e}")
+            print(f"Progress saved to {checkpoint.path}; re-run to resume.")
+            return run_indexed
+
+        checkpoint.clear(failures)
+        print(f"Streaming indexing complete. Rows indexed this run: {run_indexed}")
+        if skipped:
+            print(f"Skipped {len(skipped)} rows that keep failing (ids and attempt counts in {checkpoint.path}).")
+        if self.cache:
+            print(self.cache.report())
+        return run_indexed
+
 if __name__ == "__main__":
-    indexer = VectorIndexer()
-    # Full indexing run for the current anonymized subset
-    indexer.run_batch(limit=1400)
+    # --reembed moves rows embedded by another model to EMBEDDING_PROVIDER's model
+    indexer = VectorIndexer(reembed="--reembed" in sys.argv)
+    # Full resumable walk over every pending anonymized row
+    indexer.run_stream()
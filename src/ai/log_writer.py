@@ -0,0 +1,261 @@
+import os
+import json
+import asyncio
+import threading
+from functools import partial
+
+class ResearchLogWriter:
+    """
+    Background, batched writer for `research_logs`.
+
+    enqueue() only appends to a bounded in-memory queue, so responses never wait
+    on the database. A worker task on the event loop drains the queue and inserts
+    a batch once `batch_size` records are waiting or `flush_interval` seconds after
+    the first one arrived. The insert itself runs on `executor`.
+
+    A batch that cannot be inserted, or a record arriving while the queue is
+    full, is appended to a local JSON-lines spill file instead of being lost.
+    The spill file is replayed into the table after the next successful insert.
+    Replay progress is checkpointed, so a replay interrupted by a crash resumes
+    rather than losing or re-sending the spill. A failing replay chunk is
+    bisected; a record the table rejects on its own (e.g. a schema or size
+    violation) goes to a dead-letter file so it can't block the spill forever.
+    close() flushes everything still queued (call it on shutdown).
+
+    Args:
+        supabase: Callable returning the Supabase client (resolved lazily per batch).
+        executor: Thread pool used for the blocking inserts (None = loop default).
+        batch_size: Records per insert.
+        flush_interval: Max seconds a record waits in memory before its batch is written.
+        max_queue: Queue bound; overflow goes straight to the spill file.
+        spill_path: Append-only fallback file (defaults to .cache/research_logs.spill.jsonl).
+        dead_letter_path: Records the table keeps rejecting (defaults to <spill_path>.deadletter).
+    """
+    _STOP = object()
+
+    def __init__(self, supabase, executor=None, batch_size: int = 50, flush_interval: float = 2.0,
+                 max_queue: int = 1000, spill_path: str = None, dead_letter_path: str = None):
+        self._supabase = supabase
+        self.executor = executor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_path = spill_path or os.path.join(".cache", "research_logs.spill.jsonl")
+        self.dead_letter_path = dead_letter_path or f"{self.spill_path}.deadletter"
+        self.table = "research_logs"
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "spilled": 0, "replayed": 0, "dead_lettered": 0}
+        self._queue = None
+        self._batch_ready = None
+        self._worker = None
+        self._loop = None
+        self._file_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+
+    # --- Producer side (event loop) ---
+    def enqueue(self, record: dict):
+        """Queues one research_logs row without waiting for the database."""
+        self._ensure_worker()
+        self.stats["enqueued"] += 1
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            print("Research log queue full, spilling record to disk.")
+            self._spill([record])
+        # The worker holds one record while it waits, so a batch is ready at batch_size - 1 queued
+        if self._queue.qsize() >= self.batch_size - 1:
+            self._batch_ready.set()
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (e.g. successive asyncio.run calls in a script):
+            # carry over anything left queued by the previous loop.
+            leftover = self._drain_nowait() if self._queue is not None else []
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._batch_ready = asyncio.Event()
+            self._worker = None
+            for record in leftover:
+                self._queue.put_nowait(record)
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    def _drain_nowait(self):
+        records = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return records
+            if record is not self._STOP:
+                records.append(record)
+
+    # --- Worker ---
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is self._STOP:
+                break
+            # Wait until a full batch is queued or flush_interval passes. asyncio.wait is used
+            # rather than wait_for(queue.get()), which can swallow a cancellation on 3.11.
+            if self._queue.qsize() < self.batch_size - 1:
+                self._batch_ready.clear()
+                waiter = loop.create_task(self._batch_ready.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=self.flush_interval)
+                finally:
+                    waiter.cancel()
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if record is self._STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            try:
+                await loop.run_in_executor(self.executor, partial(self._write_batch, batch))
+            except Exception as e:
+                print(f"Research log writer error: {e}")
+
+    def _insert(self, records: list):
+        self._supabase().table(self.table).insert(records).execute()
+        self.stats["written"] += len(records)
+        self.stats["batches"] += 1
+
+    def _write_batch(self, batch: list):
+        """Inserts one batch (worker thread); spills it if the database is unavailable."""
+        try:
+            self._insert(batch)
+        except Exception as e:
+            print(f"Logging Error ({len(batch)} records spilled to {self.spill_path}): {e}")
+            self._spill(batch)
+            return
+        self._replay_spill()
+
+    # --- Spill file ---
+    def _spill(self, records: list, path: str = None):
+        path = path or self.spill_path
+        try:
+            with self._file_lock:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record) + "\n")
+            if path == self.spill_path:
+                self.stats["spilled"] += len(records)
+        except Exception as e:
+            print(f"Research log spill error, {len(records)} records lost: {e}")
+
+    def _replay_spill(self):
+        """
+        Moves spilled records back into the table once inserts succeed again.
+
+        The spill file is renamed to <spill>.replay (new spills keep going to a fresh
+        file) and the number of records inserted so far is checkpointed in
+        <spill>.replay.offset after every chunk. The replay file is only deleted
+        once every record has been inserted or dead-lettered; a leftover one from
+        an interrupted replay is resumed first.
+        """
+        if not self._replay_lock.acquire(blocking=False):
+            return
+        try:
+            replay_path = f"{self.spill_path}.replay"
+            offset_path = f"{replay_path}.offset"
+            with self._file_lock:
+                if not os.path.exists(replay_path):
+                    try:
+                        os.replace(self.spill_path, replay_path)
+                    except FileNotFoundError:
+                        return
+            with open(replay_path, "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            try:
+                with open(offset_path, "r", encoding="utf-8") as f:
+                    done = int(f.read().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                done = 0
+
+            replayed = 0
+            for i in range(done, len(records), self.batch_size):
+                chunk = records[i:i + self.batch_size]
+                inserted = self._insert_isolating(chunk)
+                if inserted is None:
+                    print(f"Spill replay paused, {len(records) - i} records kept in {replay_path}.")
+                    return
+                replayed += inserted
+                self._save_offset(offset_path, i + len(chunk))
+
+            for path in (replay_path, offset_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            print(f"Replayed {replayed} spilled research logs.")
+        finally:
+            self._replay_lock.release()
+
+    def _insert_isolating(self, records: list, reachable: bool = False):
+        """
+        Inserts a replay chunk, bisecting it if the insert fails.
+
+        A record that fails on its own is dead-lettered if the error is a data/schema
+        rejection (it carries a Postgres or PostgREST error code) or if other records
+        of the chunk went in. Otherwise the table looks unavailable and None is
+        returned so the replay stops and keeps the chunk. Returns the number inserted.
+        """
+        try:
+            self._insert(records)
+            self.stats["replayed"] += len(records)
+            return len(records)
+        except Exception as e:
+            error = e
+        if len(records) == 1:
+            if reachable or getattr(error, "code", None):
+                print(f"Research log rejected, moved to {self.dead_letter_path}: {error}")
+                self._spill(records, path=self.dead_letter_path)
+                self.stats["dead_lettered"] += 1
+                return 0
+            return None
+
+        mid = len(records) // 2
+        left = self._insert_isolating(records[:mid], reachable)
+        if left is None:
+            return None
+        right = self._insert_isolating(records[mid:], reachable or left > 0)
+        if right is None:
+            return None
+        return left + right
+
+    def _save_offset(self, path: str, done: int):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(done))
+        os.replace(tmp_path, path)
+
+    async def flush(self):
+        """Writes everything queued so far and stops the worker (it restarts on the next enqueue)."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        if self._worker is not None and not self._worker.done():
+            await self._queue.put(self._STOP)
+            self._batch_ready.set()
+            await self._worker
+        remaining = self._drain_nowait()
+        for i in range(0, len(remaining), self.batch_size):
+            await self._loop.run_in_executor(self.executor, partial(self._write_batch, remaining[i:i + self.batch_size]))
+
+    async def close(self, timeout: float = 10.0):
+        """Flushes on shutdown; whatever cannot be written within `timeout` is spilled."""
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except Exception as e:
+            print(f"Research log flush on shutdown failed: {e}")
+            if self._worker is not None:
+                self._worker.cancel()
+            if self._queue is not None:
+                self._spill(self._drain_nowait())
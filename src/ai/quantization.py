@@ -0,0 +1,187 @@
+"""
+Vector quantizers for the local search path (see LocalVectorIndex quantization).
+
+Both quantizers compress unit-norm float32 embeddings into compact codes and
+score a float query against the codes directly (asymmetric distance
+computation, ADC: the query is never quantized). ADC scores are approximate
+and are only used to pick candidates; LocalVectorIndex re-ranks the best of
+them with exact float dot products.
+
+    int8  ScalarQuantizer: one byte per dimension (768 B per vector, 4x smaller).
+    pq    ProductQuantizer: the vector is split into `m` subvectors, each stored
+          as the id of its nearest of 256 centroids (m bytes per vector,
+          e.g. 96 B at m=96, 32x smaller).
+"""
+import numpy as np
+
+# Rows decoded per step while scoring, so temporaries stay small for large corpora
+SCORE_CHUNK = 16384
+
+def _sample(vectors, sample_size: int, seed: int = 0):
+    n = len(vectors)
+    if n <= sample_size:
+        return np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    return np.asarray(vectors[np.sort(rng.choice(n, size=sample_size, replace=False))], dtype=np.float32)
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 quantization.
+
+    Each dimension is mapped linearly from its [min, max] over the training
+    sample onto [-128, 127]. Scoring uses q . x ~= codes @ (q * scale) + q . base.
+    """
+    kind = "int8"
+
+    def __init__(self):
+        self.base = None
+        self.scale = None
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    def code_size(self, dim: int) -> int:
+        return dim
+
+    def train(self, vectors, sample_size: int = 50000):
+        sample = _sample(vectors, sample_size)
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        self.scale = np.maximum(high - low, 1e-6).astype(np.float32) / 255.0
+        # Code c decodes to (c + 128) * scale + low
+        self.base = (low + 128.0 * self.scale).astype(np.float32)
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.rint((vectors - self.base) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.base
+
+    def scores(self, codes, query):
+        """Approximate q . x for every row of `codes`."""
+        weights = query * self.scale
+        offset = float(query @ self.base)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            block = codes[start:start + SCORE_CHUNK]
+            out[start:start + len(block)] = block.astype(np.float32) @ weights
+        return out + offset
+
+    def state(self) -> dict:
+        return {"kind": self.kind, "base": self.base, "scale": self.scale}
+
+    def load_state(self, state: dict):
+        self.base = np.asarray(state["base"], dtype=np.float32)
+        self.scale = np.asarray(state["scale"], dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if not self.trained else self.base.nbytes + self.scale.nbytes
+
+class ProductQuantizer:
+    """
+    Product quantization with up to 256 centroids per subspace (uint8 codes).
+
+    With fewer than 256 training vectors only as many centroids as vectors are
+    trained, and only those are stored and used (`ksub`); untrained slots would
+    otherwise sit at the origin and attract codes.
+
+    Args:
+        m: Number of subspaces (must divide the vector dimension).
+        iterations: k-means iterations per subspace while training.
+    """
+    kind = "pq"
+    max_ksub = 256
+
+    def __init__(self, m: int = 96, iterations: int = 12):
+        self.m = m
+        self.iterations = iterations
+        self.centroids = None  # (m, ksub, dsub)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def ksub(self) -> int:
+        """Centroids per subspace actually trained (<= 256)."""
+        return 0 if self.centroids is None else self.centroids.shape[1]
+
+    def code_size(self, dim: int) -> int:
+        return self.m
+
+    def _split(self, vectors):
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f"PQ needs m to divide the dimension ({dim} % {self.m} != 0)")
+        return vectors.reshape(n, self.m, dim // self.m)
+
+    def train(self, vectors, sample_size: int = 40 * 256):
+        sample = self._split(_sample(vectors, sample_size))
+        n, m, dsub = sample.shape
+        ksub = min(self.max_ksub, n)
+        rng = np.random.default_rng(0)
+        centroids = np.zeros((m, ksub, dsub), dtype=np.float32)
+        for j in range(m):
+            x = np.ascontiguousarray(sample[:, j, :])
+            c = x[rng.choice(n, size=ksub, replace=False)].copy()
+            for _ in range(self.iterations):
+                # argmin ||x - c||^2 = argmin (||c||^2 - 2 x.c)
+                assign = np.argmin((c * c).sum(axis=1) - 2.0 * (x @ c.T), axis=1)
+                counts = np.bincount(assign, minlength=ksub)
+                sums = np.stack([np.bincount(assign, weights=x[:, d], minlength=ksub) for d in range(dsub)], axis=1)
+                filled = counts > 0
+                c[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+                # Re-seed empty clusters from random points
+                if not filled.all():
+                    c[~filled] = x[rng.choice(n, size=int((~filled).sum()), replace=False)]
+            centroids[j] = c
+        self.centroids = centroids
+
+    def encode(self, vectors):
+        sub = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(sub), self.m), dtype=np.uint8)
+        norms = (self.centroids * self.centroids).sum(axis=2)  # (m, ksub)
+        for j in range(self.m):
+            codes[:, j] = np.argmin(norms[j] - 2.0 * (sub[:, j, :] @ self.centroids[j].T), axis=1)
+        return codes
+
+    def decode(self, codes):
+        parts = self.centroids[np.arange(self.m)[None, :], codes]  # (n, m, dsub)
+        return parts.reshape(len(codes), -1)
+
+    def scores(self, codes, query):
+        """ADC: one lookup table of q_sub . centroid per subspace, summed over the codes."""
+        sub = query.reshape(self.m, -1)
+        table = np.einsum("jd,jkd->jk", sub, self.centroids).astype(np.float32)  # (m, ksub)
+        out = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            block = codes[start:start + SCORE_CHUNK]
+            acc = out[start:start + len(block)]
+            # One uint8-indexed gather per subspace (cheaper than a flattened int64 index matrix)
+            for j in range(self.m):
+                acc += np.take(table[j], block[:, j])
+        return out
+
+    def state(self) -> dict:
+        return {"kind": self.kind, "m": self.m, "centroids": self.centroids}
+
+    def load_state(self, state: dict):
+        self.m = int(state["m"])
+        self.centroids = np.asarray(state["centroids"], dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if not self.trained else self.centroids.nbytes
+
+def make_quantizer(kind: str, pq_m: int = 96):
+    """Returns an untrained quantizer for 'int8' or 'pq' (None for 'none')."""
+    if not kind or kind == "none":
+        return None
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(m=pq_m)
+    raise ValueError(f"Unknown quantization: {kind} (expected 'none', 'int8' or 'pq')")
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+class ResearchCache:
+    """
+    Persistent store of completed research sessions (SQLite), replayed on repeat queries.
+
+    A record holds the phase events a live research_flow emitted after its first
+    sample was drawn, plus the final synthesis. It is keyed by the normalized
+    query, region, the models used and a fingerprint of the N=25 sample ids, so
+    any change in what retrieval returns produces a different key. Records that
+    expanded beyond N=25 also store a fingerprint of the full candidate pool,
+    which must still match for a hit. Records expire after `ttl` seconds, and
+    the indexer calls invalidate() whenever it adds embeddings.
+
+    The default path is shared by the app and the indexer running on the same
+    host. Point RESEARCH_CACHE_PATH at the same file if they run from different
+    working directories.
+
+    Args:
+        path: SQLite file location (defaults to .cache/research.sqlite3).
+        ttl: Record lifetime in seconds (None keeps records until invalidated).
+    """
+    # Bump when the recorded event format or prompts change meaningfully
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str = None, ttl: float = 86400):
+        self.path = path or os.getenv("RESEARCH_CACHE_PATH") or os.path.join(".cache", "research.sqlite3")
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_runs (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                region TEXT,
+                model TEXT,
+                pool_fingerprint TEXT,
+                events TEXT NOT NULL,
+                response TEXT NOT NULL,
+                n INTEGER,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def fingerprint(ids: list) -> str:
+        """Order-sensitive digest of retrieved row ids."""
+        return hashlib.sha256("\x1f".join(str(i) for i in ids).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_key(cls, query: str, region: str, models: list, sample_ids: list) -> str:
+        payload = "\x1e".join([
+            str(cls.SCHEMA_VERSION), query, region or "", ",".join(models), cls.fingerprint(sample_ids)
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns the recorded run ({events, response, n, model, pool_fingerprint, created_at}) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pool_fingerprint, events, response, n, created_at, model FROM research_runs WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl and time.time() - row[4] > self.ttl:
+                self._conn.execute("DELETE FROM research_runs WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {
+            "pool_fingerprint": row[0],
+            "events": json.loads(row[1]),
+            "response": row[2],
+            "n": row[3],
+            "created_at": row[4],
+            "model": row[5]
+        }
+
+    def put(self, key: str, query: str, region: str, events: list, response: str, n: int,
+            model: str = None, pool_fingerprint: str = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO research_runs (key, query, region, model, pool_fingerprint, events, response, n, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, query, region, model, pool_fingerprint, json.dumps(events), response, n, time.time())
+            )
+            self._conn.commit()
+
+    def invalidate(self) -> int:
+        """Drops every recorded run (e.g. after new rows were indexed). Returns the number removed."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM research_runs").rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM research_runs").fetchone()[0]
+        return {
+            "size": size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
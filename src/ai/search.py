@@ -1,56 +1,387 @@
 import os
-import google.generativeai as genai
-from supabase import create_client, Client
-from dotenv import load_dotenv
-from tabulate import tabulate
+import sys
+import time
+import asyncio
+import threading
+from functools import partial
+from datetime import datetime, timezone
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to sys.path for robust imports
+root_path = Path(__file__).resolve().parent.parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import load_env, get_supabase_client, configure_gemini, get_generative_model
+from src.ai.cache import TTLCache, RefreshAheadCache
+from src.ai.context_builder import ContextBuilder
+from src.ai.research_cache import ResearchCache
+from src.ai.log_writer import ResearchLogWriter
+from src.ai.embeddings import get_embedding_provider, schema_lacks_model_column
 
 class SemanticSearch:
+    # Google Trends keywords tracked by the dashboard (chart series order)
+    TREND_KEYWORDS = ["anxiety", "depression", "mental health", "self care", "therapy"]
+    # Curated phrasings embedded alongside each keyword for the embedding classifier
+    TREND_SYNONYMS = {
+        "anxiety": ["anxious and worried all the time", "panic attacks", "nervous and overthinking", "exam stress and pressure", "social anxiety"],
+        "depression": ["feeling hopeless and empty", "sad and crying every day", "no motivation to do anything", "feeling numb and worthless", "suicidal thoughts"],
+        "mental health": ["mental wellbeing", "struggling emotionally", "psychological health", "burnout and emotional exhaustion", "loneliness and isolation"],
+        "self care": ["taking care of myself", "coping strategies and relaxation", "sleep, exercise and routines", "journaling and mindfulness", "taking a break to recharge"],
+        "therapy": ["seeing a therapist or counsellor", "counselling services", "talking to a psychologist", "getting professional help", "psychiatrist and medication"],
+    }
+
     def __init__(self):
-        load_dotenv()
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        load_env()
         self.gemini_key = os.getenv("GEMINI_API_KEY")
+        # Query embeddings come from EMBEDDING_PROVIDER (see src/ai/embeddings.py); searches only
+        # match rows embedded by the same model. The local provider can search without Gemini.
+        self.embedding_provider = get_embedding_provider()
         
-        if not self.gemini_key:
+        if not self.gemini_key and self.embedding_provider.remote:
             raise ValueError("GEMINI_API_KEY must be set for search.")
             
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
-        genai.configure(api_key=self.gemini_key)
-        self.model = "models/text-embedding-004"
+        # Shared pooled clients (see src/clients.py). Both are created on first use
+        # (or by warm_up()) so constructing SemanticSearch stays cheap at startup.
+        self._supabase = None
+        self.model = self.embedding_provider.model
+        # Cleared if the search RPC predates the filter_model parameter (phase5 migration)
+        self.filter_model_supported = True
+        # Cleared if the search RPC predates the filter_ai_only parameter (phase2 migration);
+        # the Verified filter is then applied to the results instead
+        self.filter_ai_only_supported = True
+        # A research session re-embeds the same query for every sampling stage,
+        # and /api/search re-embeds on paging and filter toggles.
+        self.query_cache = TTLCache(
+            maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+        )
+
+        # Blocking Supabase calls made from async code run on this bounded pool
+        # so they never stall the event loop (and other users' SSE streams).
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SEARCH_THREAD_POOL_SIZE", "16")),
+            thread_name_prefix="search-io"
+        )
+
+        # Search backend: 'rpc' (match_social_posts in Postgres) or 'local' (in-process index)
+        self.backend = os.getenv("SEARCH_BACKEND", "rpc").lower()
+        # RPC used by the 'rpc' backend; match_social_posts_v2 (phase3 migration) is HNSW-indexable
+        self.search_rpc = os.getenv("SEARCH_RPC", "match_social_posts")
+        self.local_index_refresh = float(os.getenv("LOCAL_INDEX_REFRESH_SECONDS", "300"))
+        # Built on first use by the 'local' backend (see _get_local_index)
+        self.local_index = None
+        self._local_index_lock = threading.Lock()
+
+        # Banner counts per (ai_only, region): served from memory, refreshed in the
+        # background after STATS_CACHE_TTL and never older than STATS_CACHE_MAX_STALENESS.
+        self.stats_cache = RefreshAheadCache(
+            ttl=float(os.getenv("STATS_CACHE_TTL", "60")),
+            max_staleness=float(os.getenv("STATS_CACHE_MAX_STALENESS", "300")),
+            executor=self.executor
+        )
+
+        # research_flow: when the N=120/500 candidate pool is fetched. 'expand' (default):
+        # only once the first audit says EXPAND, so SATURATED runs make one small RPC.
+        # 'speculative': concurrently with the first audit; hides the fetch for EXPAND runs
+        # but costs SATURATED runs a second RPC, which runs to completion even when
+        # discarded. 'upfront': one over-fetch before the audit.
+        self.expansion_prefetch = os.getenv("RESEARCH_EXPANSION_PREFETCH", "expand").lower()
+        if self.expansion_prefetch not in ("expand", "speculative", "upfront"):
+            print(f"Unknown RESEARCH_EXPANSION_PREFETCH={self.expansion_prefetch}, using 'expand'.")
+            self.expansion_prefetch = "expand"
+        # Forward synthesis text as 'synthesis_chunk' events while Gemini generates it
+        self.stream_synthesis = os.getenv("RESEARCH_STREAM_SYNTHESIS", "1").lower() in ("1", "true", "yes")
+
+        # Synthesis prompt assembly: dedup, truncation and packing into a token budget
+        self.context_builder = ContextBuilder(
+            token_budget=int(os.getenv("RESEARCH_CONTEXT_TOKEN_BUDGET", "50000")),
+            max_tokens_per_narrative=int(os.getenv("RESEARCH_MAX_TOKENS_PER_NARRATIVE", "400")),
+            embedding_threshold=float(os.getenv("RESEARCH_DEDUP_EMBEDDING_THRESHOLD", "0.97")),
+            shingle_threshold=float(os.getenv("RESEARCH_DEDUP_SHINGLE_THRESHOLD", "0.8"))
+        )
+
+        # Completed research runs replayed from disk when the query, region, models and
+        # retrieved narratives are unchanged (opened on first use, see _get_research_cache)
+        self.research_cache_enabled = os.getenv("RESEARCH_CACHE", "1").lower() in ("1", "true", "yes")
+        self.research_cache_ttl = float(os.getenv("RESEARCH_CACHE_TTL", "86400"))
+        self.research_cache = None
+        self._research_cache_lock = threading.Lock()
+
+        # research_logs inserts are queued and written in batches by a background task,
+        # so no response waits on logging. Flushed on shutdown (see app lifespan).
+        self.log_writer = ResearchLogWriter(
+            lambda: self.supabase,
+            executor=self.executor,
+            batch_size=int(os.getenv("RESEARCH_LOG_BATCH_SIZE", "50")),
+            flush_interval=float(os.getenv("RESEARCH_LOG_FLUSH_SECONDS", "2")),
+            max_queue=int(os.getenv("RESEARCH_LOG_QUEUE_SIZE", "1000")),
+            spill_path=os.getenv("RESEARCH_LOG_SPILL_PATH")
+        )
+
+        # map_query_to_trend: memoized per normalized query; the embedding classifier
+        # answers confident cases and the LLM is only asked when the margin is ambiguous.
+        self.trend_map_cache = TTLCache(
+            maxsize=int(os.getenv("TREND_MAP_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("TREND_MAP_CACHE_TTL", "86400"))
+        )
+        self.trend_match_min_similarity = float(os.getenv("TREND_MATCH_MIN_SIMILARITY", "0.6"))
+        self.trend_match_margin = float(os.getenv("TREND_MATCH_MARGIN", "0.05"))
+        self.trend_match_floor = float(os.getenv("TREND_MATCH_FLOOR", "0.45"))
+        self.trend_map_stats = {"embedding": 0, "llm": 0}
+        self._trend_prototypes = None
+        self._trend_prototype_lock = threading.Lock()
+
+        # Chart-ready trend series per (region, days). Trends change at most daily, so an
+        # entry is re-validated against the newest google_trends date every
+        # TRENDS_CACHE_CHECK_SECONDS and only re-fetched when that date (or the window) moves.
+        self.trends_cache = {}
+        self.trends_check_interval = float(os.getenv("TRENDS_CACHE_CHECK_SECONDS", "600"))
+        self.trends_stats = {"hits": 0, "revalidated": 0, "fetches": 0}
+        self._trends_lock = threading.Lock()
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            self._supabase = get_supabase_client()
+        return self._supabase
+
+    @supabase.setter
+    def supabase(self, client):
+        self._supabase = client
+
+    def warm_up(self):
+        """
+        Eagerly creates the Supabase client, configures Gemini, (for the local
+        backend) builds the vector index and primes the stats and trend-classifier
+        caches, so the first request doesn't pay for it.
+        """
+        _ = self.supabase
+        if self.gemini_key:
+            configure_gemini()
+        if self.backend == "local":
+            self._get_local_index()
+        # Prime the banner count for every toggle combination
+        for ai_only in (False, True):
+            for region in (None, "Singapore"):
+                try:
+                    self.stats_cache.load((ai_only, region), partial(
+                        self.get_total_count, ai_only=ai_only, region=region, raise_errors=True
+                    ))
+                except Exception as e:
+                    print(f"Count warm-up error: {e}")
+        # Keyword/synonym embeddings for map_query_to_trend
+        try:
+            self._get_trend_prototypes()
+        except Exception as e:
+            print(f"Trend classifier warm-up error: {e}")
+
+    def close(self):
+        """Releases the search I/O pool and the research cache."""
+        self.executor.shutdown(wait=False)
+        if self.research_cache is not None:
+            self.research_cache.close()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Collapse whitespace and case so trivially different queries share a cache entry."""
+        return " ".join((query or "").split()).casefold()
 
     def get_query_embedding(self, query: str):
-        """Generate embedding for the search query."""
+        """
+        Generate embedding for the search query (served from the LRU/TTL cache when possible).
+        Concurrent requests for the same uncached query share one embedding call.
+        """
+        task_type = "retrieval_query"
+        cache_key = (self.normalize_query(query), self.model, task_type)
+        try:
+            return self.query_cache.get_or_load(
+                cache_key,
+                lambda: self.embedding_provider.embed([query], task_type=task_type)[0],
+                should_cache=lambda embedding: embedding is not None
+            )
+        except Exception as e:
+            print(f"Error generating query embedding: {e}")
+            return None
+
+    async def get_query_embedding_async(self, query: str):
+        """Async counterpart of get_query_embedding (shares the same cache)."""
+        task_type = "retrieval_query"
+        cache_key = (self.normalize_query(query), self.model, task_type)
+
+        async def embed():
+            return (await self.embedding_provider.embed_async([query], task_type=task_type))[0]
+
         try:
-            result = genai.embed_content(
-                model=self.model,
-                content=query,
-                task_type="retrieval_query"
+            return await self.query_cache.get_or_load_async(
+                cache_key, embed, should_cache=lambda embedding: embedding is not None
             )
-            return result['embedding']
         except Exception as e:
             print(f"Error generating query embedding: {e}")
             return None
 
-    def search(self, query: str, threshold=0.5, limit=5, region: str = None):
-        print(f"\n--- Searching Internal Brain for: '{query}' (Region: {region or 'All'}) ---")
+    async def run_blocking(self, func, *args, **kwargs):
+        """Runs a blocking call (Supabase client, sync SDKs) on the search I/O pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for the in-process caches."""
+        return {
+            "query_embeddings": self.query_cache.stats(),
+            "stats_counts": self.stats_cache.stats(),
+            "trends": {"size": len(self.trends_cache), **self.trends_stats},
+            "trend_mapping": {**self.trend_map_cache.stats(), **self.trend_map_stats},
+            "research_runs": self.research_cache.stats() if self.research_cache is not None else None
+        }
+
+    def _get_research_cache(self):
+        """Opens the persistent research cache on first use (None when disabled or unavailable)."""
+        if not self.research_cache_enabled:
+            return None
+        if self.research_cache is None:
+            with self._research_cache_lock:
+                if self.research_cache is None:
+                    try:
+                        self.research_cache = ResearchCache(ttl=self.research_cache_ttl)
+                    except Exception as e:
+                        print(f"Research cache unavailable, running uncached: {e}")
+                        self.research_cache_enabled = False
+        return self.research_cache
+
+    def _get_local_index(self):
+        """Builds the local index on first use, then keeps it fresh in the background."""
+        if self.local_index is None:
+            # Single-flight: concurrent first requests wait for one build instead of each running their own
+            with self._local_index_lock:
+                if self.local_index is None:
+                    self.local_index = self._create_local_index()
+        self.local_index.refresh_in_background(self.local_index_refresh)
+        return self.local_index
+
+    def _create_local_index(self):
+        """Creates the local index from its snapshot (LOCAL_INDEX_SNAPSHOT) or a full build."""
+        from src.ai.vector_index import LocalVectorIndex
+        index = LocalVectorIndex(
+            self.supabase,
+            mode=os.getenv("LOCAL_INDEX_MODE", "exact").lower(),
+            nprobe=int(os.getenv("LOCAL_INDEX_NPROBE", "8")),
+            dim=self.embedding_provider.dim,
+            embedding_model=self.embedding_provider.name,
+            allow_untagged=self.embedding_provider.legacy,
+            quantization=os.getenv("LOCAL_INDEX_QUANTIZATION", "none").lower(),
+            pq_m=int(os.getenv("LOCAL_INDEX_PQ_M", "96")),
+            rerank=int(os.getenv("LOCAL_INDEX_RERANK", "4")),
+            vector_file=os.getenv("LOCAL_INDEX_VECTOR_FILE") or None,
+            rebuild_interval=float(os.getenv("LOCAL_INDEX_REBUILD_SECONDS", "86400"))
+        )
+        snapshot = os.getenv("LOCAL_INDEX_SNAPSHOT")
+        loaded = False
+        if snapshot and os.path.isdir(snapshot):
+            try:
+                index.load(snapshot)
+                loaded = True
+            except ValueError as e:
+                print(f"Ignoring local index snapshot: {e}")
+        if not loaded:
+            index.build()
+        return index
+
+    def search(self, query: str, threshold=0.5, limit=5, region: str = None, ai_only: bool = False):
+        """
+        Returns up to `limit` narratives above `threshold`, most similar first.
+
+        `ai_only` (the Verified toggle) is applied inside the RPC / local index,
+        so exactly `limit` qualifying rows come back when enough exist.
+        """
+        print(f"\n--- Searching Internal Brain for: '{query}' (Region: {region or 'All'}, Verified: {ai_only}) ---")
         
         query_embedding = self.get_query_embedding(query)
         if not query_embedding:
             return
 
+        return self.search_by_embedding(query_embedding, threshold=threshold, limit=limit, region=region, ai_only=ai_only)
+
+    async def search_async(self, query: str, threshold=0.5, limit=5, region: str = None, ai_only: bool = False):
+        """Non-blocking search: async embedding, then the RPC / index lookup on the I/O pool."""
+        print(f"\n--- Searching Internal Brain for: '{query}' (Region: {region or 'All'}, Verified: {ai_only}) ---")
+
+        query_embedding = await self.get_query_embedding_async(query)
+        if not query_embedding:
+            return
+
+        return await self.run_blocking(
+            self.search_by_embedding, query_embedding,
+            threshold=threshold, limit=limit, region=region, ai_only=ai_only
+        )
+
+    # Rows requested per result when the Verified filter has to be applied client-side
+    AI_ONLY_OVERFETCH = 4
+
+    def search_by_embedding(self, query_embedding, threshold=0.5, limit=5, region: str = None, ai_only: bool = False):
+        """Matches an already-computed query embedding against the configured backend."""
         try:
+            if self.backend == "local":
+                results = self._get_local_index().search(
+                    query_embedding, threshold=threshold, limit=limit, region=region, ai_only=ai_only
+                )
+                if not results:
+                    print("No relevant narratives found.")
+                    return
+                return results
+
+            params = {
+                "query_embedding": query_embedding,
+                "match_threshold": threshold,
+                "match_count": limit,
+                "filter_region": region
+            }
+            # Only sent when set, so databases without the filter_ai_only parameter keep working
+            if ai_only:
+                if self.filter_ai_only_supported:
+                    params["filter_ai_only"] = True
+                else:
+                    params["match_count"] = limit * self.AI_ONLY_OVERFETCH
+            # Never compare vectors from different embedding models
+            if self.filter_model_supported:
+                params["filter_model"] = self.embedding_provider.name
+
             # Call the Supabase RPC function we created
-            resp = self.supabase.rpc(
-                "match_social_posts",
-                {
-                    "query_embedding": query_embedding,
-                    "match_threshold": threshold,
-                    "match_count": limit,
-                    "filter_region": region
-                }
-            ).execute()
+            while True:
+                try:
+                    resp = self.supabase.rpc(self.search_rpc, params).execute()
+                    break
+                except Exception as e:
+                    if "filter_model" in params and schema_lacks_model_column(e):
+                        if not self.embedding_provider.legacy:
+                            raise RuntimeError(f"{self.search_rpc} has no filter_model parameter; apply "
+                                               f"scripts/phase5_embedding_model.sql to search {self.embedding_provider.name} vectors") from e
+                        # Pre-migration database: every stored vector is text-embedding-004
+                        print(f"{self.search_rpc} has no filter_model parameter, searching untagged vectors "
+                              f"(apply scripts/phase5_embedding_model.sql).")
+                        self.filter_model_supported = False
+                        params.pop("filter_model")
+                        continue
+                    message = str(e)
+                    if "filter_ai_only" in params and "filter_ai_only" in message and (
+                            "PGRST202" in message or "Could not find the function" in message):
+                        print(f"{self.search_rpc} has no filter_ai_only parameter, applying the Verified filter "
+                              f"to the results instead (apply scripts/phase2_schema_update.sql).")
+                        self.filter_ai_only_supported = False
+                        params.pop("filter_ai_only")
+                        params["match_count"] = limit * self.AI_ONLY_OVERFETCH
+                        continue
+                    raise
             
             results = resp.data
+            if results and ai_only and "filter_ai_only" not in params:
+                if "ai_bucket_id" not in results[0]:
+                    print(f"Verified filter unavailable: {self.search_rpc} does not return ai_bucket_id "
+                          f"(apply scripts/phase2_schema_update.sql).")
+                    return
+                # Same rule as the banner count: only AI-classified rows
+                results = [row for row in results if row.get("ai_bucket_id") is not None][:limit]
             if not results:
                 print("No relevant narratives found.")
                 return
@@ -60,7 +391,7 @@ class SemanticSearch:
         except Exception as e:
             print(f"Search error: {e}")
 
-    def get_total_count(self, ai_only: bool = False, region: str = None):
+    def get_total_count(self, ai_only: bool = False, region: str = None, raise_errors: bool = False):
         """
         [⚠️ GUARDIAN WARNING]: DATA COUNT LOGIC IS FRAGILE.
         This function implements 4 specific clinical rules for the banner count.
@@ -69,6 +400,9 @@ class SemanticSearch:
         3. Efficiency: Uses count='planned' (fast) with an exact fallback for accuracy.
         4. Toggles are additive (AND logic).
         DO NOT refactor to a generic filter without maintaining these specific rules.
+        
+        Uncached; /api/stats goes through get_total_count_async (stats cache).
+        raise_errors=True lets the cache keep its last good value instead of caching 0.
         """
         try:
             # Use count='planned' for fast estimation on large social_posts table
@@ -94,12 +428,93 @@ class SemanticSearch:
             return res.count
             
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Count error: {e}")
             return 0
 
-    def map_query_to_trend(self, query: str):
-        """Map a user query to one of the tracked Google Trends keywords."""
-        keywords = ["anxiety", "depression", "mental health", "self care", "therapy"]
+    # Returned by _map_query_to_trend_llm when the LLM call failed (not cached, unlike a real "NONE")
+    _MAPPING_FAILED = object()
+
+    def map_query_to_trend(self, query: str, query_embedding=None):
+        """
+        Map a user query to one of the tracked Google Trends keywords (or None).
+        
+        Memoized per normalized query. The query embedding (normally already cached
+        by the search that preceded this call) is compared with precomputed keyword
+        and synonym embeddings; the LLM is only consulted when that is ambiguous.
+        """
+        def classify():
+            decided, mapped = self._classify_trend_by_embedding(query, query_embedding)
+            if decided:
+                self.trend_map_stats["embedding"] += 1
+                return mapped
+            self.trend_map_stats["llm"] += 1
+            return self._map_query_to_trend_llm(query)
+
+        # Concurrent requests for the same query share one classification
+        mapped = self.trend_map_cache.get_or_load(
+            self.normalize_query(query), classify,
+            # Transient LLM error: don't hide the trend for this query for a whole TTL
+            should_cache=lambda result: result is not self._MAPPING_FAILED
+        )
+        return None if mapped is self._MAPPING_FAILED else mapped
+
+    def _get_trend_prototypes(self):
+        """Embeds every keyword and synonym once; returns (keyword per row, unit-norm matrix)."""
+        if self._trend_prototypes is None:
+            with self._trend_prototype_lock:
+                if self._trend_prototypes is None:
+                    import numpy as np
+                    labels, texts = [], []
+                    for keyword in self.TREND_KEYWORDS:
+                        for text in [keyword] + self.TREND_SYNONYMS.get(keyword, []):
+                            labels.append(keyword)
+                            texts.append(text)
+                    vectors = self.embedding_provider.embed(texts, task_type="retrieval_document")
+                    matrix = np.asarray(vectors, dtype=np.float32)
+                    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+                    self._trend_prototypes = (labels, matrix)
+        return self._trend_prototypes
+
+    def _classify_trend_by_embedding(self, query: str, query_embedding=None):
+        """
+        Returns (decided, keyword). decided is False when the best keyword is neither a
+        clear match (>= TREND_MATCH_MIN_SIMILARITY and TREND_MATCH_MARGIN ahead of the
+        runner-up) nor clearly unrelated (< TREND_MATCH_FLOOR).
+        """
+        try:
+            import numpy as np
+            if query_embedding is None:
+                query_embedding = self.get_query_embedding(query)
+            if not query_embedding:
+                return False, None
+            labels, matrix = self._get_trend_prototypes()
+
+            q = np.asarray(query_embedding, dtype=np.float32)
+            q /= np.linalg.norm(q) + 1e-12
+            similarities = matrix @ q
+            best_per_keyword = {}
+            for keyword, similarity in zip(labels, similarities):
+                best_per_keyword[keyword] = max(best_per_keyword.get(keyword, -1.0), float(similarity))
+            ranked = sorted(best_per_keyword.items(), key=lambda item: item[1], reverse=True)
+            (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+
+            if best_score < self.trend_match_floor:
+                return True, None
+            if best_score >= self.trend_match_min_similarity and best_score - runner_up >= self.trend_match_margin:
+                return True, best
+        except Exception as e:
+            print(f"Trend classifier error: {e}")
+        return False, None
+
+    def _map_query_to_trend_llm(self, query: str):
+        """
+        LLM fallback for queries the embedding classifier can't decide.
+
+        Returns a keyword, None for a real "no match", or _MAPPING_FAILED if the call failed.
+        """
+        keywords = self.TREND_KEYWORDS
         prompt = f"""
         You are a youth mental health specialist assistant.
         Given the user query: "{query}"
@@ -112,14 +527,13 @@ class SemanticSearch:
         Do not provide explanations.
         """
         try:
-            model = genai.GenerativeModel('gemini-2.0-flash-exp') 
+            model = get_generative_model('gemini-2.0-flash-exp') 
             response = model.generate_content(prompt)
             mapped = response.text.strip().lower()
-            if mapped in keywords:
-                return mapped
+            return mapped if mapped in keywords else None
         except Exception as e:
             print(f"Mapping error: {e}")
-        return None
+            return self._MAPPING_FAILED
 
     def get_trends_data(self, region: str = None, days: int = 180):
         """Fetch 180-day trend data for the 5 core keywords."""
@@ -144,10 +558,99 @@ class SemanticSearch:
             print(f"Trends fetch error: {e}")
             return []
 
+    @staticmethod
+    def shape_trend_series(rows: list, keywords: list) -> dict:
+        """
+        Pivots google_trends rows into columnar chart series:
+        {"labels": [date, ...], "series": {keyword: [score or None per label]}}.
+        """
+        labels = sorted({row["date"] for row in rows if row.get("keyword") in keywords})
+        position = {date: i for i, date in enumerate(labels)}
+        series = {keyword: [None] * len(labels) for keyword in keywords}
+        for row in rows:
+            values = series.get(row.get("keyword"))
+            if values is not None:
+                values[position[row["date"]]] = row["score"]
+        return {"labels": labels, "series": series}
+
+    def _newest_trend_date(self, region: str = None):
+        resp = self.supabase.table("google_trends")\
+            .select("date")\
+            .eq("region", region or "Global")\
+            .order("date", desc=True)\
+            .limit(1)\
+            .execute()
+        return resp.data[0]["date"] if resp.data else None
+
+    def get_trend_series(self, region: str = None, days: int = 180):
+        """
+        Chart-ready 180-day series for the tracked keywords (see shape_trend_series),
+        served from the in-process trends cache.
+        """
+        from datetime import datetime, timedelta
+        key = (region or "Global", days)
+        cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        with self._trends_lock:
+            entry = self.trends_cache.get(key)
+        # The window slides daily, so an entry is only valid for the cutoff it was built with
+        if entry and entry["cutoff"] != cutoff_date:
+            entry = None
+        if entry and time.monotonic() - entry["checked_at"] < self.trends_check_interval:
+            self.trends_stats["hits"] += 1
+            return entry["data"]
+
+        try:
+            newest = self._newest_trend_date(region)
+        except Exception as e:
+            print(f"Trends freshness check error: {e}")
+            if entry:
+                return entry["data"]
+            newest = None
+
+        if entry and newest == entry["newest"]:
+            entry["checked_at"] = time.monotonic()
+            self.trends_stats["revalidated"] += 1
+            return entry["data"]
+
+        rows = self.get_trends_data(region=region, days=days)
+        self.trends_stats["fetches"] += 1
+        data = self.shape_trend_series(rows, self.TREND_KEYWORDS)
+        # An empty fetch for a non-empty table is an error; don't pin it in the cache
+        if rows or newest is None:
+            with self._trends_lock:
+                self.trends_cache[key] = {
+                    "data": data, "newest": newest, "cutoff": cutoff_date, "checked_at": time.monotonic()
+                }
+        return data
+
+
+    async def get_total_count_async(self, ai_only: bool = False, region: str = None):
+        """Banner count from the stats cache; only a cold or too-stale key hits the database."""
+        key = (bool(ai_only), region)
+        loader = partial(self.get_total_count, ai_only=ai_only, region=region, raise_errors=True)
+        count = self.stats_cache.lookup(key, loader)
+        if count is not RefreshAheadCache.MISSING:
+            return count
+        try:
+            return await self.run_blocking(self.stats_cache.load, key, loader)
+        except Exception as e:
+            print(f"Count error: {e}")
+            return 0
+
+    async def get_trends_data_async(self, region: str = None, days: int = 180):
+        return await self.run_blocking(self.get_trends_data, region=region, days=days)
+
+    async def get_trend_series_async(self, region: str = None, days: int = 180):
+        return await self.run_blocking(self.get_trend_series, region=region, days=days)
+
+    async def map_query_to_trend_async(self, query: str, query_embedding=None):
+        return await self.run_blocking(self.map_query_to_trend, query, query_embedding=query_embedding)
 
     async def log_research_query(self, session_id: str, query: str, query_type: str, response: str = None, n: int = None, metadata: dict = None):
         """
         Logs a research query and its corresponding AI response to the database.
+        Returns immediately: the row is queued and inserted in a batch by self.log_writer.
         
         Args:
             session_id: Unique identifier for the research session (links primary and follow-up queries).
@@ -164,34 +667,157 @@ class SemanticSearch:
                 "query_type": query_type,
                 "response_text": response,
                 "n_used": n,
-                "metadata": metadata or {}
+                "metadata": metadata or {},
+                # Stamped at enqueue time so batched or replayed rows keep their real time
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
             # Remove None values to use DB defaults
             cleaned_data = {k: v for k, v in data.items() if v is not None}
-            self.supabase.table("research_logs").insert(cleaned_data).execute()
+            self.log_writer.enqueue(cleaned_data)
         except Exception as e:
             print(f"Logging Error: {e}")
 
+    async def stream_generation(self, model_name: str, prompt: str, stream: bool = True):
+        """
+        Yields the text of a Gemini generation as it arrives (one piece per streamed
+        chunk), or the whole text at once when stream=False.
+        """
+        model = get_generative_model(model_name)
+        if not stream:
+            response = await model.generate_content_async(prompt)
+            yield response.text
+            return
+
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                piece = chunk.text
+            except ValueError:
+                continue  # e.g. a trailing chunk carrying only finish/safety metadata
+            if piece:
+                yield piece
+
+    # (threshold, limit) of each research sampling stage: N=25 -> N=120 -> N=500
+    RESEARCH_STAGES = [(0.1, 25), (0.04, 120), (0.02, 500)]
+
+    @staticmethod
+    def stage_sample(candidates: list, threshold: float, limit: int):
+        """
+        Derives a sampling stage from the similarity-sorted candidate pool.
+
+        Equivalent to a separate match_social_posts call with this threshold and
+        limit, because every stage is a prefix of the widest (lowest threshold,
+        highest limit) result set.
+        """
+        sample = [r for r in candidates or [] if (r.get('similarity') or 0) > threshold][:limit]
+        return sample or None
+
+    # Models whose output a recorded research run depends on (part of the cache key)
+    RESEARCH_MODELS = ("gemini-2.0-flash-exp", "gemini-3-flash-preview")
+
     async def research_flow(self, query: str, region: str = None, session_id: str = None):
         """
         [⚠️ GUARDIAN WARNING]: PROTOCOL ORCHESTRATION IS FRAGILE.
         This generator is tightly coupled to the 'Protocol Trace' frontend tab.
         - EVERY 'yield' is parsed by name in handleResearchUpdate (index.html).
-        - Phases: 'sampling', 'audit', 'audit_result', 'log', 'synthesis', 'complete', 'error'.
+        - Phases: 'sampling', 'audit', 'audit_result', 'log', 'synthesis', 'synthesis_chunk', 'complete', 'error'.
+        - 'synthesis_chunk' carries incremental synthesis text; 'complete' still carries the full text.
+        - A research cache hit replays the recorded phases (without 'synthesis_chunk') after a 'log' event.
         - Changing phase names or payload structures will break the clinical audit UI.
         """
+        # Records the events of a live run once its cache key is known (i.e. after the
+        # N=25 sample) and stores them when it completes cleanly. See _research_flow.
+        run = {"key": None, "cacheable": True}
+        recorded = []
+        async for event in self._research_flow(query, region, session_id, run):
+            if run["key"] and event["phase"] != "synthesis_chunk":
+                recorded.append(event)
+                if event["phase"] == "complete" and run["cacheable"]:
+                    try:
+                        await self.run_blocking(
+                            self.research_cache.put, run["key"], self.normalize_query(query), region,
+                            recorded, event["content"], event.get("n"),
+                            model=run.get("model"), pool_fingerprint=run.get("pool_fingerprint")
+                        )
+                    except Exception as e:
+                        print(f"Research cache write error: {e}")
+            yield event
+
+    async def _research_flow(self, query: str, region: str, session_id: str, run: dict):
+        """Live research protocol behind research_flow; `run` carries cache state back to it."""
         import json
         
+        # Every stage is sliced in memory from one candidate pool (the widest stage).
+        # Unless it is fetched up front, only the N=25 stage is fetched before the first
+        # audit and the pool is fetched on EXPAND (or, with speculative prefetch, as a
+        # task while the audit LLM call runs; see expansion_prefetch).
+        wide_threshold, wide_limit = self.RESEARCH_STAGES[-1]
+        wide_task = None
+
+        async def fetch_pool():
+            if wide_task is not None:
+                return await wide_task
+            return await self.search_async(query, threshold=wide_threshold, limit=wide_limit, region=region)
+
         # Phase 1: Initial Sampling (Small N for quick audit)
         yield {"phase": "sampling", "status": "Sampling initial top 25 narratives...", "n": 25}
         yield {"phase": "log", "message": "Threshold: 0.1, Limit: 25", "data": {"threshold": 0.1, "limit": 25}}
-        batch1 = self.search(query, threshold=0.1, limit=25, region=region)
+        if self.expansion_prefetch != "upfront":
+            candidates = None
+            batch1 = self.stage_sample(
+                await self.search_async(query, threshold=self.RESEARCH_STAGES[0][0], limit=self.RESEARCH_STAGES[0][1], region=region),
+                *self.RESEARCH_STAGES[0]
+            )
+            if batch1 and self.expansion_prefetch == "speculative":
+                wide_task = asyncio.create_task(
+                    self.search_async(query, threshold=wide_threshold, limit=wide_limit, region=region)
+                )
+        else:
+            candidates = await self.search_async(query, threshold=wide_threshold, limit=wide_limit, region=region)
+            batch1 = self.stage_sample(candidates, *self.RESEARCH_STAGES[0])
         yield {"phase": "log", "message": f"Initial batch retrieved: {len(batch1 or [])} docs", "data": {"n": len(batch1 or [])}}
         
         if not batch1:
             yield {"phase": "error", "content": "No relevant narratives found for research sampling."}
             return
 
+        # Research cache: the key covers the N=25 sample, so it is known before the audit;
+        # runs that expanded are only replayed if the wider pool is also unchanged.
+        research_cache = self._get_research_cache()
+        if research_cache is not None:
+            key = ResearchCache.make_key(
+                self.normalize_query(query), region, self.RESEARCH_MODELS, [r.get('id') for r in batch1]
+            )
+            try:
+                record = await self.run_blocking(research_cache.get, key)
+            except Exception as e:
+                print(f"Research cache read error: {e}")
+                record = None
+            if record is not None and record["pool_fingerprint"]:
+                if candidates is None:
+                    candidates = await fetch_pool()
+                if ResearchCache.fingerprint([r.get('id') for r in candidates or []]) != record["pool_fingerprint"]:
+                    record = None
+            if record is not None:
+                if wide_task is not None and not wide_task.done():
+                    wide_task.cancel()
+                age = time.time() - record["created_at"]
+                yield {"phase": "log", "message": f"Research cache hit: replaying run recorded {age / 60:.0f} min ago",
+                       "data": {"cached": True, "age_seconds": round(age)}}
+                for event in record["events"]:
+                    yield event
+                if session_id:
+                    await self.log_research_query(
+                        session_id=session_id,
+                        query=query,
+                        query_type="primary",
+                        response=record["response"],
+                        n=record["n"],
+                        metadata={"region": region, "model": record["model"], "cached": True}
+                    )
+                return
+            run["key"] = key
+
         # Phase 2: Saturation Audit
         yield {"phase": "audit", "status": "Auditing thematic saturation & variance...", "n": len(batch1)}
         
@@ -207,7 +833,7 @@ class SemanticSearch:
         {{"decision": "SATURATED" or "EXPAND", "reason": "Short reason", "confidence": 0-100}}
         """
         try:
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            model = get_generative_model('gemini-2.0-flash-exp')
             response = await model.generate_content_async(audit_prompt)
             text = response.text.strip()
             # Robust JSON extraction
@@ -230,14 +856,18 @@ class SemanticSearch:
                 # Phase 3: Expansion 1 (Middle N)
                 yield {"phase": "sampling", "status": "Expanding sample to N=120 for statistical depth...", "n": 120}
                 yield {"phase": "log", "message": "Expansion Threshold: 0.04, Limit: 120", "data": {"threshold": 0.04, "limit": 120}}
-                batch2 = self.search(query, threshold=0.04, limit=120, region=region)
+                if candidates is None:
+                    candidates = await fetch_pool()
+                if run["key"]:
+                    run["pool_fingerprint"] = ResearchCache.fingerprint([r.get('id') for r in candidates or []])
+                batch2 = self.stage_sample(candidates, *self.RESEARCH_STAGES[1])
                 final_batch = batch2 or batch1
                 yield {"phase": "log", "message": f"Secondary batch retrieved: {len(batch2 or [])} docs", "data": {"n": len(batch2 or [])}}
 
                 # Phase 3.5: Secondary Audit
                 yield {"phase": "audit", "status": "Auditing secondary sample for saturation...", "n": len(final_batch)}
                 try:
-                    model_2 = genai.GenerativeModel('gemini-2.0-flash-exp')
+                    model_2 = get_generative_model('gemini-2.0-flash-exp')
                     response_2 = await model_2.generate_content_async(audit_prompt.replace(str(len(batch1)), str(len(final_batch))))
                     text_2 = response_2.text.strip()
                     if "{" in text_2 and "}" in text_2:
@@ -248,39 +878,55 @@ class SemanticSearch:
                         if decision_2 == "EXPAND":
                             yield {"phase": "sampling", "status": "Final Expansion to N=500 for maximum thematic capture...", "n": 500}
                             yield {"phase": "log", "message": "Final Expansion Threshold: 0.02, Limit: 500", "data": {"threshold": 0.02, "limit": 500}}
-                            batch3 = self.search(query, threshold=0.02, limit=500, region=region)
+                            batch3 = self.stage_sample(candidates, *self.RESEARCH_STAGES[2])
                             final_batch = batch3 or final_batch
                             yield {"phase": "log", "message": f"Final batch retrieved: {len(batch3 or [])} docs", "data": {"n": len(batch3 or [])}}
                     else:
                         yield {"phase": "audit_result", "decision": "SATURATED", "reason": "Secondary audit inconclusive, using N=120"}
                 except Exception as e:
                     print(f"Secondary Audit Error: {e}")
+                    run["cacheable"] = False
                     yield {"phase": "audit_result", "decision": "SATURATED", "reason": "Secondary audit failed, proceeding with current sample."}
             
         except Exception as e:
             print(f"Audit Error: {e}")
+            run["cacheable"] = False
             final_batch = batch1 # Fallback
             yield {"phase": "audit_result", "decision": "SATURATED", "reason": "Audit failed, proceeding with initial sample."}
 
+        # SATURATED (or audit failure): the speculative pool is not needed. Cancelling only
+        # drops the result; the RPC already running in the executor still completes.
+        if wide_task is not None and not wide_task.done():
+            wide_task.cancel()
+
         # Phase 4: Final Synthesis
         yield {"phase": "synthesis", "status": f"Synthesizing {len(final_batch)} narratives...", "n": len(final_batch)}
         
-        context = ""
-        for i, r in enumerate(final_batch):
-            content = r.get('content_scrubbed') or r.get('content') or "No content"
-            context += f"Narrative {i+1}: {content}\n\n"
+        # Dedup near-identical narratives, truncate long ones and pack into the token budget.
+        # Both steps are CPU-bound (O(n^2) dedup; vectors_for waits on the index lock during a
+        # refresh), so they run off the event loop.
+        embeddings = None
+        if self.local_index is not None:
+            embeddings = await self.run_blocking(self.local_index.vectors_for, [r.get('id') for r in final_batch])
+        context, packing = await self.run_blocking(self.context_builder.build, final_batch, embeddings=embeddings)
+        yield {
+            "phase": "log",
+            "message": f"Context packed: {packing['packed']} narratives (~{packing['tokens']} tokens), "
+                       f"dropped {packing['dropped']} ({packing['duplicates']} near-duplicates, {packing['over_budget']} over budget)",
+            "data": packing
+        }
 
         synthesis_prompt = f"""
         SYSTEM ROLE: Senior Youth Mental Health Researcher.
         USER QUERY: "{query}"
-        DATA SOURCE: {len(final_batch)} youth narratives.
+        DATA SOURCE: {packing['packed']} youth narratives (near-duplicates removed from a sample of N={len(final_batch)}).
 
         [RAW NARRATIVES]
         {context}
 
         ---
         [RESEARCH INSTRUCTIONS]
-        Synthesize the {len(final_batch)} narratives above into a high-level research report.
+        Synthesize the {packing['packed']} narratives above into a high-level research report.
         
         CRITICAL RULES:
         1. DO NOT repeat, echo, or list the individual narratives.
@@ -306,11 +952,17 @@ class SemanticSearch:
         Begin synthesis immediately.
         """
         
+        streamed = False
         try:
             # Using Gemini 3 Flash for the final deep synthesis
-            model = genai.GenerativeModel('gemini-3-flash-preview')
-            response = await model.generate_content_async(synthesis_prompt)
-            final_text = response.text
+            pieces = []
+            async for piece in self.stream_generation('gemini-3-flash-preview', synthesis_prompt, stream=self.stream_synthesis):
+                pieces.append(piece)
+                if self.stream_synthesis:
+                    streamed = True
+                    yield {"phase": "synthesis_chunk", "content": piece}
+            final_text = "".join(pieces)
+            run["model"] = 'gemini-3-flash-preview'
             yield {"phase": "complete", "content": final_text, "n": len(final_batch)}
             
             # Async logging
@@ -321,15 +973,20 @@ class SemanticSearch:
                     query_type="primary",
                     response=final_text,
                     n=len(final_batch),
-                    metadata={"region": region, "model": "gemini-3-flash-preview"}
+                    metadata={"region": region, "model": "gemini-3-flash-preview", "cached": False}
                 )
         except Exception as e:
             # Fallback to 2.0 if 3.0 is not yet available in this environment
             print(f"Gemini 3 Synthesis Error, falling back to 2.0: {e}")
             try:
-                model_fb = genai.GenerativeModel('gemini-2.0-flash-exp')
-                response_fb = await model_fb.generate_content_async(synthesis_prompt)
-                final_text_fb = response_fb.text
+                pieces_fb = []
+                async for piece in self.stream_generation('gemini-2.0-flash-exp', synthesis_prompt, stream=self.stream_synthesis):
+                    if self.stream_synthesis:
+                        # 'reset' tells the UI to discard text streamed by the failed attempt
+                        yield {"phase": "synthesis_chunk", "content": piece, "reset": streamed and not pieces_fb}
+                    pieces_fb.append(piece)
+                final_text_fb = "".join(pieces_fb)
+                run["model"] = 'gemini-2.0-flash-exp'
                 yield {"phase": "complete", "content": final_text_fb, "n": len(final_batch)}
                 
                 if session_id:
@@ -339,7 +996,7 @@ class SemanticSearch:
                         query_type="primary",
                         response=final_text_fb,
                         n=len(final_batch),
-                        metadata={"region": region, "model": "gemini-2.0-flash-exp", "fallback": True}
+                        metadata={"region": region, "model": "gemini-2.0-flash-exp", "fallback": True, "cached": False}
                     )
             except Exception as e2:
                 yield {"phase": "error", "content": f"Synthesis Error: {str(e2)}"}
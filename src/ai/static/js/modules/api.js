@@ -19,7 +19,7 @@ export const API = {
     /**
      * Fetch Google Trends data for the chart.
      * @param {boolean} sgOnly - Filter trends by SG region context.
-     * @returns {Promise<Array>} List of trend data points.
+     * @returns {Promise<{labels: string[], series: Object<string, Array<number|null>>}>} Chart-ready series per keyword.
      */
     async getTrends(sgOnly) {
         const res = await fetch(`/api/trends?sg_only=${sgOnly}`);
@@ -97,5 +97,29 @@ export const API = {
         });
         if (!res.ok) throw new Error('Follow-up API Error');
         return res.json();
+    },
+
+    /**
+     * Ask a follow-up question and stream the answer (SSE: answer_chunk... then complete).
+     * @param {string} query - The user's follow-up question.
+     * @param {string} context - The previous synthesis text.
+     * @param {Array} results - The original search results context.
+     * @param {string} sessionId - The current session ID.
+     * @returns {Promise<Response>} The raw fetch response (for streaming).
+     */
+    async followUpStream(query, context, results, sessionId) {
+        const res = await fetch('/api/follow-up', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                query,
+                context,
+                results,
+                session_id: sessionId,
+                stream: true
+            })
+        });
+        if (!res.ok) throw new Error('Follow-up API Error');
+        return res;
     }
 };
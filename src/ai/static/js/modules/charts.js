@@ -34,15 +34,16 @@ const weekendPlugin = {
 };
 
 /**
- * Fetch and render the Google Trends chart for the last 180 days.
+ * Fetch and render the Google Trends chart for the last 180 days (series are pre-shaped server-side).
  * Includes weekend highlighting overlay.
  * @param {boolean} sgOnly - Filter by Singapore region.
  */
 export async function updateTrends(sgOnly) {
     const container = document.getElementById('trends-container');
     try {
-        const data = await API.getTrends(sgOnly).then(res => res.data);
-        if (!data || data.length === 0) {
+        // Server returns pre-shaped series: { labels: [dates], series: { keyword: [score|null] } }
+        const { labels: dates, series } = await API.getTrends(sgOnly);
+        if (!dates || dates.length === 0) {
             container.style.display = 'none';
             return;
         }
@@ -50,8 +51,6 @@ export async function updateTrends(sgOnly) {
         container.style.display = 'block';
         const ctx = document.getElementById('trendsChart').getContext('2d');
 
-        // Group by keyword and date
-        const keywords = ["anxiety", "depression", "mental health", "self care", "therapy"];
         const colors = {
             'anxiety': '#6366f1',
             'depression': '#ec4899',
@@ -60,16 +59,7 @@ export async function updateTrends(sgOnly) {
             'therapy': '#8b5cf6'
         };
 
-        // Prepare labels (dates)
-        const dates = [...new Set(data.map(d => d.date))].sort();
-
-        const datasets = keywords.map(kw => {
-            const kwData = data.filter(d => d.keyword === kw);
-            const values = dates.map(date => {
-                const entry = kwData.find(d => d.date === date);
-                return entry ? entry.score : null;
-            });
-
+        const datasets = Object.entries(series).map(([kw, values]) => {
             return {
                 label: kw.charAt(0).toUpperCase() + kw.slice(1),
                 data: values,
@@ -7,6 +7,40 @@ import * as UI from './ui.js';
 
 // Internal state to track the latest synthesis for follow-ups
 let _currentSynthesis = "";
+// Synthesis text received so far via 'synthesis_chunk' events
+let _streamedSynthesis = "";
+
+/**
+ * Read an SSE response body and invoke `onEvent` for every parsed `data:` payload.
+ * @param {Response} response - fetch response with a streaming body.
+ * @param {Function} onEvent - callback receiving the parsed JSON object.
+ */
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop(); // Keep partial line in buffer
+
+        for (const line of lines) {
+            const trimmed = line.trim();
+            // SSE Standard: lines starting with "data: "
+            if (trimmed.startsWith('data: ')) {
+                try {
+                    onEvent(JSON.parse(trimmed.substring(6)));
+                } catch (e) {
+                    console.error("Research Stream Parse Error", e, trimmed);
+                }
+            }
+        }
+    }
+}
 
 /**
  * Orchestrate the research protocol via Server-Sent Events (SSE).
@@ -30,31 +64,8 @@ export async function conductResearch(query, sgOnly, sessionId) {
 
     try {
         const response = await API.startResearch(query, sgOnly, sessionId);
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
-
-        while (true) {
-            const { value, done } = await reader.read();
-            if (done) break;
-
-            buffer += decoder.decode(value, { stream: true });
-            const lines = buffer.split('\n');
-            buffer = lines.pop(); // Keep partial line in buffer
-
-            for (const line of lines) {
-                const trimmed = line.trim();
-                // SSE Standard: lines starting with "data: "
-                if (trimmed.startsWith('data: ')) {
-                    try {
-                        const data = JSON.parse(trimmed.substring(6));
-                        handleResearchUpdate(data, logs, synthesisText);
-                    } catch (e) {
-                        console.error("Research Stream Parse Error", e, trimmed);
-                    }
-                }
-            }
-        }
+        _streamedSynthesis = "";
+        await readEventStream(response, data => handleResearchUpdate(data, logs, synthesisText));
     } catch (err) {
         console.error("Research Error:", err);
         synthesisText.innerHTML = `<span style="color: #ef4444;">Research Protocol Failed: ${err.message}</span>`;
@@ -108,7 +119,13 @@ function handleResearchUpdate(data, logs, synthesisText) {
 <pre style="font-size: 0.75rem; color: #cbd5e1; background: #1e1e1e; padding: 10px; margin: 10px 0; border-radius: 5px; overflow-x: auto;">${JSON.stringify(data.data, null, 2)}</pre>` : ''}`;
         if (protocolLog) protocolLog.appendChild(pEntry);
 
-        // 4. Completion
+        // 4. Streaming synthesis text (the 'complete' event re-sends the full text)
+    } else if (data.phase === 'synthesis_chunk') {
+        if (data.reset) _streamedSynthesis = "";
+        _streamedSynthesis += data.content;
+        synthesisText.innerHTML = window.marked ? window.marked.parse(_streamedSynthesis) : _streamedSynthesis;
+
+        // 5. Completion
     } else if (data.phase === 'complete') {
         // Store synthesis for follow-up
         _currentSynthesis = data.content;
@@ -123,7 +140,7 @@ function handleResearchUpdate(data, logs, synthesisText) {
         pEntry.innerHTML = `<span style="color: #6d6d6d;">[${new Date().toLocaleTimeString()}]</span> <span style="color: #4ade80;">[SUCCESS]</span> Protocol complete with N=${data.n}`;
         if (protocolLog) protocolLog.appendChild(pEntry);
 
-        // 5. Errors within stream
+        // 6. Errors within stream
     } else if (data.phase === 'error') {
         synthesisText.innerHTML = `<span style="color: #ef4444;">Error: ${data.content}</span>`;
     }
@@ -150,26 +167,34 @@ export async function handleFollowUp(currentResults, sessionId) {
     }
 
     try {
-        const data = await API.followUp(q, _currentSynthesis, currentResults, sessionId);
-
-        if (data) {
-            const followUpDiv = document.createElement('div');
-            followUpDiv.style.marginTop = '2rem';
-            followUpDiv.style.paddingTop = '2rem';
-            followUpDiv.style.borderTop = '1px solid var(--glass-border)';
-
-            const responseTitle = document.createElement('div');
-            responseTitle.style.cssText = "color: var(--accent-color); font-size: 0.7rem; font-weight: 800; margin-bottom: 1rem;";
-            responseTitle.textContent = "FOLLOW-UP RESPONSE";
-            followUpDiv.appendChild(responseTitle);
-
-            const responseContent = document.createElement('div');
-            UI.formatSynthesis(data.answer, responseContent);
-            followUpDiv.appendChild(responseContent);
-
-            synthesisText.appendChild(followUpDiv);
-            document.getElementById('follow-up-ui').style.display = 'none'; // Only one follow-up per design
-        }
+        const followUpDiv = document.createElement('div');
+        followUpDiv.style.marginTop = '2rem';
+        followUpDiv.style.paddingTop = '2rem';
+        followUpDiv.style.borderTop = '1px solid var(--glass-border)';
+
+        const responseTitle = document.createElement('div');
+        responseTitle.style.cssText = "color: var(--accent-color); font-size: 0.7rem; font-weight: 800; margin-bottom: 1rem;";
+        responseTitle.textContent = "FOLLOW-UP RESPONSE";
+        followUpDiv.appendChild(responseTitle);
+
+        const responseContent = document.createElement('div');
+        followUpDiv.appendChild(responseContent);
+
+        // Stream the answer into the response block as it is generated
+        const response = await API.followUpStream(q, _currentSynthesis, currentResults, sessionId);
+        let answer = "";
+        synthesisText.appendChild(followUpDiv);
+        await readEventStream(response, data => {
+            if (data.phase === 'answer_chunk') {
+                answer += data.content;
+                UI.formatSynthesis(answer, responseContent);
+            } else if (data.phase === 'complete') {
+                UI.formatSynthesis(data.answer, responseContent);
+            } else if (data.phase === 'error') {
+                UI.formatSynthesis(data.content, responseContent);
+            }
+        });
+        document.getElementById('follow-up-ui').style.display = 'none'; // Only one follow-up per design
     } catch (e) {
         console.error(e);
     } finally {
@@ -0,0 +1,660 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+
+from src.ai.embeddings import schema_lacks_model_column
+from src.ai.quantization import make_quantizer
+
+# Columns returned alongside each match, mirroring the match_social_posts RPC
+METADATA_COLUMNS = [
+    "id", "content_scrubbed", "content", "platform", "post_dt",
+    "region", "bucket_id", "ai_bucket_id", "ai_explanation"
+]
+# Scanned on every refresh; a row whose filter metadata changed is re-fetched and replaced
+REFRESH_COLUMNS = ["id", "region", "ai_bucket_id"]
+
+def parse_embedding(value):
+    """pgvector columns arrive over PostgREST as '[0.1,0.2,...]' strings."""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+class LocalVectorIndex:
+    """
+    In-process vector index over `social_posts.embedding` (alternative to the RPC backend).
+
+    All embeddings are held as one L2-normalized float32 matrix, so cosine
+    similarity is a single matrix-vector product. Region and ai-only filters
+    are boolean masks applied inside the index, and results carry the same
+    columns (plus `similarity`) as the match_social_posts RPC.
+
+    Modes:
+        exact: Vectorized brute-force top-k over every row.
+        ivf: Inverted-file approximate search. Rows are bucketed by a k-means
+            coarse quantizer and only the `nprobe` closest buckets are scored.
+
+    Quantization (combines with either mode):
+        int8 / pq: Compressed codes (see src/ai/quantization.py) score the
+            candidates by asymmetric distance; the best `rerank` x `limit` of
+            them are re-scored exactly against the float vectors. With
+            `vector_file` set, the float vectors live in a memory-mapped file
+            instead of RAM, so only the codes stay resident and re-ranking reads
+            just the candidate rows.
+
+    Args:
+        supabase: Client used to load and refresh rows.
+        mode: 'exact' or 'ivf'.
+        nlist: Number of IVF buckets (defaults to ~sqrt(N)).
+        nprobe: IVF buckets scored per query.
+        page_size: Rows fetched per keyset page while loading.
+        dim: Vector length of the embedding model.
+        embedding_model: Only rows tagged with this social_posts.embedding_model are loaded.
+        allow_untagged: Load every embedded row if the embedding_model column doesn't exist
+            yet (only safe for the model that wrote the pre-migration rows).
+        quantization: 'none', 'int8' or 'pq'.
+        pq_m: PQ subspaces (bytes per vector); must divide `dim`.
+        rerank: Candidates re-scored exactly per requested result when quantized.
+        vector_file: Raw float32 file backing the float vectors (memory-mapped).
+        rebuild_interval: Seconds after which refresh() reloads every row instead of
+            syncing incrementally, picking up changed vectors and text (0 = never).
+    """
+    def __init__(self, supabase, mode: str = "exact", nlist: int = None, nprobe: int = 8,
+                 page_size: int = 500, dim: int = 768, embedding_model: str = None,
+                 allow_untagged: bool = False, quantization: str = None, pq_m: int = 96,
+                 rerank: int = 4, vector_file: str = None, rebuild_interval: float = 86400):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown local index mode: {mode}")
+        self.supabase = supabase
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.page_size = page_size
+        self.dim = dim
+        self.embedding_model = embedding_model
+        self.allow_untagged = allow_untagged
+        self.quantizer = make_quantizer(quantization, pq_m=pq_m)
+        self.rerank = rerank
+        self.vector_file = vector_file
+        self.codes = None
+        self._quantized_size = 0
+        # Bumped on every add/remove so a quantizer trained outside the lock can tell if rows moved
+        self._version = 0
+        self._train_lock = threading.Lock()
+        # Ids replaced in place while a retrain is in flight (None when no retrain is running)
+        self._stale_ids = None
+        # vector_file is written as numbered generations: a file still mapped by a reader is
+        # never replaced in place (Windows refuses that), it is deleted once released
+        self._vector_generation = 0
+        self._stale_vector_files = []
+
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.rows = []
+        self.ids = []
+        self._positions = {}
+        self._sg_mask = np.zeros(0, dtype=bool)
+        self._ai_mask = np.zeros(0, dtype=bool)
+        self._regions = np.zeros(0, dtype=object)
+
+        self._centroids = None
+        self._assignments = None
+        self._trained_size = 0
+
+        self.rebuild_interval = rebuild_interval
+        self.last_refresh = None
+        self.last_build = None
+        self._lock = threading.RLock()
+        self._refreshing = threading.Event()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Loading ---
+    def _fetch_pages(self, columns: list, ids: list = None):
+        """Yields pages of embedded rows, by id keyset or for an explicit id list."""
+        select = ", ".join(columns)
+        if ids is not None:
+            for i in range(0, len(ids), 100):
+                chunk = ids[i:i + 100]
+                yield self.supabase.table("social_posts").select(select).in_("id", chunk).execute().data
+            return
+
+        cursor = None
+        while True:
+            query = self.supabase.table("social_posts")\
+                .select(select)\
+                .not_.is_("embedding", "null")
+            if self.embedding_model:
+                query = query.eq("embedding_model", self.embedding_model)
+            if cursor:
+                query = query.gt("id", cursor)
+            try:
+                rows = query.order("id").limit(self.page_size).execute().data
+            except Exception as e:
+                if not (self.embedding_model and self.allow_untagged and schema_lacks_model_column(e)):
+                    raise
+                print("embedding_model column not found, loading untagged vectors (apply scripts/phase5_embedding_model.sql).")
+                self.embedding_model = None
+                continue
+            if not rows:
+                return
+            yield rows
+            cursor = rows[-1]["id"]
+            if len(rows) < self.page_size:
+                return
+
+    def build(self):
+        """
+        Loads every embedded row into a fresh index.
+
+        The new index is assembled off to the side and swapped in at the end,
+        so searches keep using the current one while a rebuild runs.
+        """
+        started = time.perf_counter()
+        rows = []
+        for page in self._fetch_pages(METADATA_COLUMNS + ["embedding"]):
+            rows.extend(page)
+
+        staged = LocalVectorIndex(
+            None, mode=self.mode, nlist=self.nlist, nprobe=self.nprobe, dim=self.dim,
+            quantization=self.quantizer.kind if self.quantizer is not None else None,
+            pq_m=getattr(self.quantizer, "m", 96), rerank=self.rerank
+        )
+        staged.add(rows)
+
+        with self._lock:
+            self._set_vectors(staged.vectors)
+            for attr in ("rows", "ids", "_positions", "_sg_mask", "_ai_mask", "_regions",
+                         "_centroids", "_assignments", "_trained_size",
+                         "quantizer", "codes", "_quantized_size"):
+                setattr(self, attr, getattr(staged, attr))
+            self._version += 1
+            if self._stale_ids is not None:
+                # An in-flight retrain must not reuse codes of the replaced vectors
+                self._stale_ids.update(self.ids)
+            self.last_refresh = self.last_build = time.time()
+
+        memory = self.memory_stats()
+        print(f"Local vector index built: {len(self)} rows in {time.perf_counter() - started:.1f}s "
+              f"({memory['resident_bytes'] / 1024 / 1024:.1f} MB resident, mode={self.mode}, "
+              f"quantization={memory['quantization']})")
+
+    def refresh(self):
+        """
+        Syncs the index with the table.
+
+        Incremental refreshes scan only REFRESH_COLUMNS: full rows are fetched for
+        newly embedded ids and for rows whose region or ai_bucket_id changed
+        (e.g. reclassification), and rows whose embedding was cleared are dropped.
+        Changes to the vector or text of an existing row are picked up by the
+        full rebuild every `rebuild_interval` seconds.
+        """
+        if not len(self):
+            return self.build()
+        if self.rebuild_interval and (self.last_build is None or time.time() - self.last_build >= self.rebuild_interval):
+            return self.build()
+
+        remote = {}
+        for page in self._fetch_pages(REFRESH_COLUMNS):
+            for row in page:
+                remote[row["id"]] = row
+
+        with self._lock:
+            known = {row["id"]: row for row in self.rows}
+        new_ids = sorted(set(remote) - set(known))
+        removed_ids = set(known) - set(remote)
+        changed_ids = sorted(
+            row_id for row_id, row in remote.items()
+            if row_id in known and any(known[row_id].get(col) != row.get(col) for col in REFRESH_COLUMNS)
+        )
+
+        fetched = []
+        for page in self._fetch_pages(METADATA_COLUMNS + ["embedding"], ids=new_ids + changed_ids):
+            fetched.extend(page)
+
+        # remove() and add() lock individually, so a quantizer retrain inside add() never blocks searches
+        if removed_ids:
+            self.remove(removed_ids)
+        if fetched:
+            # add() replaces rows whose id is already indexed
+            self.add(fetched)
+        self.last_refresh = time.time()
+
+        if new_ids or changed_ids or removed_ids:
+            print(f"Local vector index refreshed: +{len(new_ids)} / ~{len(changed_ids)} / -{len(removed_ids)} rows "
+                  f"(total {len(self)})")
+
+    def refresh_in_background(self, max_age: float):
+        """Starts a background refresh if the index is older than `max_age` seconds."""
+        if self.last_refresh and time.time() - self.last_refresh < max_age:
+            return
+        if self._refreshing.is_set():
+            return
+        self._refreshing.set()
+
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Local index refresh error: {e}")
+            finally:
+                self._refreshing.clear()
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    # --- Mutation ---
+    def add(self, rows: list):
+        """
+        Adds (or replaces) rows that carry an `embedding` plus metadata columns.
+
+        When quantized, new rows are encoded with the current codebook; a
+        (re)train, needed first and then whenever the corpus doubles, runs after
+        the lock is released (see _retrain_codes).
+        """
+        # Parse and normalize before taking the lock
+        parsed = []
+        for row in rows:
+            embedding = parse_embedding(row.get("embedding"))
+            if embedding is None:
+                continue
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+            parsed.append((row["id"], vector, {col: row.get(col) for col in METADATA_COLUMNS}))
+
+        fresh, fresh_vectors, replaced = [], [], []
+        retrain = False
+        with self._lock:
+            for row_id, vector, meta in parsed:
+                pos = self._positions.get(row_id)
+                if pos is not None:
+                    if not self.vectors.flags.writeable:
+                        self._set_vectors(np.array(self.vectors))
+                    self.vectors[pos] = vector
+                    self.rows[pos] = meta
+                    self._set_masks(pos, meta)
+                    replaced.append(pos)
+                else:
+                    fresh.append(meta)
+                    fresh_vectors.append(vector)
+
+            if replaced:
+                self._version += 1
+                if self._codes_current(len(self.ids)):
+                    self.codes[replaced] = self.quantizer.encode(self.vectors[replaced])
+                if self._stale_ids is not None:
+                    self._stale_ids.update(self.ids[pos] for pos in replaced)
+                if self.mode == "ivf" and self._centroids is not None:
+                    # Move updated embeddings to their new bucket so nprobe can still reach them
+                    self._assignments[replaced] = np.argmax(self.vectors[replaced] @ self._centroids.T, axis=1)
+            if not fresh:
+                return
+
+            start = len(self.ids)
+            self._append_vectors(np.stack(fresh_vectors))
+            self.rows.extend(fresh)
+            self.ids.extend(meta["id"] for meta in fresh)
+            for offset, meta in enumerate(fresh):
+                self._positions[meta["id"]] = start + offset
+            self._sg_mask = np.concatenate([self._sg_mask, np.zeros(len(fresh), dtype=bool)])
+            self._ai_mask = np.concatenate([self._ai_mask, np.zeros(len(fresh), dtype=bool)])
+            self._regions = np.concatenate([self._regions, np.empty(len(fresh), dtype=object)])
+            for offset, meta in enumerate(fresh):
+                self._set_masks(start + offset, meta)
+
+            self._version += 1
+
+            if self.mode == "ivf":
+                self._update_ivf(start)
+            if self.quantizer is not None:
+                retrain = self._extend_codes(start)
+        if retrain:
+            self._retrain_codes()
+
+    def remove(self, ids):
+        with self._lock:
+            drop = {self._positions[i] for i in ids if i in self._positions}
+            if not drop:
+                return
+            self._version += 1
+            keep = np.array([pos not in drop for pos in range(len(self.ids))], dtype=bool)
+            self._set_vectors(self.vectors[keep])
+            if self._codes_current(len(keep)):
+                self.codes = self.codes[keep]
+            else:
+                # A retrain is pending; it re-encodes every row once it sees the version change
+                self.codes = None
+            self.rows = [row for pos, row in enumerate(self.rows) if keep[pos]]
+            self.ids = [row["id"] for row in self.rows]
+            self._positions = {row_id: pos for pos, row_id in enumerate(self.ids)}
+            self._sg_mask = self._sg_mask[keep]
+            self._ai_mask = self._ai_mask[keep]
+            self._regions = self._regions[keep]
+            if self._assignments is not None:
+                self._assignments = self._assignments[keep]
+
+    def _set_masks(self, pos: int, meta: dict):
+        region = meta.get("region")
+        self._regions[pos] = region
+        self._sg_mask[pos] = region in ("Singapore", "SG")
+        self._ai_mask[pos] = meta.get("ai_bucket_id") is not None
+
+    # --- Float storage ---
+    def _vector_path(self, generation: int) -> str:
+        return f"{self.vector_file}.{generation}"
+
+    def _set_vectors(self, vectors):
+        """
+        Replaces the float matrix, writing it to `vector_file` (memory-mapped) when configured.
+
+        Each rewrite goes to a new generation file (`<vector_file>.<n>`) rather than
+        replacing the mapped one: Windows cannot replace or delete a file while it is
+        mapped, and searches or a retrain may still hold the previous map.
+        """
+        if not self.vector_file or not len(vectors):
+            self.vectors = vectors
+            self._drop_stale_vector_files()
+            return
+        directory = os.path.dirname(self.vector_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        if not self._vector_generation:
+            # Generations left behind by an earlier process
+            prefix = os.path.basename(self.vector_file) + "."
+            self._stale_vector_files.extend(
+                os.path.join(directory, name) for name in os.listdir(directory)
+                if name.startswith(prefix) and name[len(prefix):].isdigit()
+            )
+        self._vector_generation += 1
+        path = self._vector_path(self._vector_generation)
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(path)
+        previous = self.vectors
+        self.vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(len(vectors), self.dim))
+        if isinstance(previous, np.memmap) and previous.filename != os.path.abspath(path):
+            self._stale_vector_files.append(previous.filename)
+        del previous
+        self._drop_stale_vector_files()
+
+    def _drop_stale_vector_files(self):
+        """Deletes superseded vector files; ones still mapped elsewhere are retried on the next rewrite."""
+        pending = []
+        for path in self._stale_vector_files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                pending.append(path)
+        self._stale_vector_files = pending
+
+    def _append_vectors(self, new):
+        path = self._vector_path(self._vector_generation)
+        if self.vector_file and isinstance(self.vectors, np.memmap) and self.vectors.filename == os.path.abspath(path):
+            # Grow the file in place; only the new rows are written
+            n = len(self.vectors)
+            self.vectors.flush()
+            with open(path, "ab") as f:
+                f.write(np.ascontiguousarray(new, dtype=np.float32).tobytes())
+            self.vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(n + len(new), self.dim))
+        else:
+            self._set_vectors(np.vstack([self.vectors, new]))
+
+    # --- Vector quantization ---
+    @staticmethod
+    def _encode_all(quantizer, vectors, chunk: int = 65536):
+        return np.concatenate([
+            quantizer.encode(vectors[i:i + chunk]) for i in range(0, len(vectors), chunk)
+        ])
+
+    def _extend_codes(self, start: int) -> bool:
+        """Encodes rows from `start` with the current codebook; returns True if a (re)train is due."""
+        n = len(self.ids)
+        # Retrain once the corpus doubles (like the IVF quantizer). Until the retrain swaps in
+        # codes for every row, the length mismatch makes search() score the floats exactly.
+        if not self._codes_current(start) or n >= 2 * self._quantized_size:
+            return True
+        self.codes = np.concatenate([self.codes, self.quantizer.encode(self.vectors[start:n])])
+        return False
+
+    def _codes_current(self, n: int) -> bool:
+        """True if there is one code per row for the first `n` rows (no retrain pending)."""
+        return self.codes is not None and self.quantizer.trained and len(self.codes) == n
+
+    def _retrain_codes(self, catch_up_passes: int = 3):
+        """
+        Trains a new quantizer on a snapshot of the vectors without holding the index
+        lock (PQ training takes seconds), then swaps it and its codes in. Until then
+        searches use the previous codes, or exact float scoring if there are none.
+
+        Rows added, replaced or removed during training are caught up outside the lock
+        too, encoding only those rows; after `catch_up_passes` the remaining delta is
+        encoded under the lock so a steady stream of writes cannot starve the swap.
+        """
+        with self._train_lock:
+            with self._lock:
+                vectors, ids, version = self.vectors, list(self.ids), self._version
+                quantizer = make_quantizer(self.quantizer.kind, pq_m=getattr(self.quantizer, "m", 96))
+                self._stale_ids = set()
+            try:
+                if not ids:
+                    return
+                quantizer.train(vectors[:len(ids)])
+                codes = self._encode_all(quantizer, vectors[:len(ids)])
+                passes = 0
+                while True:
+                    with self._lock:
+                        if self._version != version and passes >= catch_up_passes:
+                            codes, ids = self._catch_up_codes(quantizer, codes, ids, self.vectors,
+                                                              self.ids, self._stale_ids)
+                            version = self._version
+                        if self._version == version:
+                            self.quantizer, self.codes, self._quantized_size = quantizer, codes, len(ids)
+                            return
+                        vectors, current, stale, version = self.vectors, list(self.ids), self._stale_ids, self._version
+                        self._stale_ids = set()
+                    codes, ids = self._catch_up_codes(quantizer, codes, ids, vectors, current, stale)
+                    passes += 1
+            finally:
+                with self._lock:
+                    self._stale_ids = None
+
+    @classmethod
+    def _catch_up_codes(cls, quantizer, codes, ids, vectors, current, stale):
+        """
+        Codes for the rows `current` (aligned with `vectors`), reusing `codes` (aligned with
+        `ids`) for rows that are still present and not in `stale`, and encoding the rest.
+        """
+        previous = {row_id: pos for pos, row_id in enumerate(ids)}
+        reuse_to, reuse_from, encode = [], [], []
+        for pos, row_id in enumerate(current):
+            old = previous.get(row_id)
+            if old is None or row_id in stale:
+                encode.append(pos)
+            else:
+                reuse_to.append(pos)
+                reuse_from.append(old)
+        caught_up = np.empty((len(current), codes.shape[1]), dtype=codes.dtype)
+        if reuse_to:
+            caught_up[reuse_to] = codes[reuse_from]
+        if encode:
+            caught_up[encode] = cls._encode_all(quantizer, vectors[encode])
+        return caught_up, list(current)
+
+    def memory_stats(self) -> dict:
+        """Bytes held by the index's vectors, split into what is resident and what is memory-mapped."""
+        floats = int(self.vectors.nbytes)
+        mapped = isinstance(self.vectors, np.memmap)
+        codes = int(self.codes.nbytes) if self.codes is not None else 0
+        quantizer = self.quantizer.nbytes if self.quantizer is not None else 0
+        return {
+            "rows": len(self),
+            "quantization": self.quantizer.kind if self.quantizer is not None else "none",
+            "float_bytes": floats,
+            "floats_memory_mapped": bool(mapped),
+            "code_bytes": codes,
+            "quantizer_bytes": quantizer,
+            "resident_bytes": (0 if mapped else floats) + codes + quantizer
+        }
+
+    # --- IVF coarse quantizer ---
+    def _train_ivf(self, iterations: int = 10, sample_size: int = 20000):
+        n = len(self.ids)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(0)
+        sample = self.vectors[rng.choice(n, size=min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        # Spherical k-means: vectors and centroids stay unit length
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self._centroids = centroids
+        self._assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+        self._trained_size = n
+
+    def _update_ivf(self, start: int):
+        # Retrain once the corpus doubles; otherwise assign new rows to existing buckets
+        if self._centroids is None or len(self.ids) >= 2 * self._trained_size:
+            self._train_ivf()
+            return
+        new_assignments = np.argmax(self.vectors[start:] @ self._centroids.T, axis=1)
+        self._assignments = np.concatenate([self._assignments, new_assignments])
+
+    # --- Query ---
+    def _filter_mask(self, region: str = None, ai_only: bool = False):
+        mask = None
+        if region == "Singapore":
+            mask = self._sg_mask
+        elif region:
+            mask = self._regions == region
+        if ai_only:
+            mask = self._ai_mask if mask is None else (mask & self._ai_mask)
+        return mask
+
+    def search(self, query_embedding, threshold: float = 0.5, limit: int = 5,
+               region: str = None, ai_only: bool = False):
+        """
+        Returns up to `limit` rows with cosine similarity above `threshold`,
+        most similar first, in the same shape as the match_social_posts RPC.
+        """
+        q = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        with self._lock:
+            if not len(self.ids) or limit <= 0:
+                return []
+
+            mask = self._filter_mask(region, ai_only)
+            if self.mode == "ivf" and self._centroids is not None:
+                probe = np.argsort(-(self._centroids @ q))[:self.nprobe]
+                candidates = np.nonzero(np.isin(self._assignments, probe))[0]
+            else:
+                candidates = np.arange(len(self.ids))
+
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if not len(candidates):
+                return []
+
+            whole = len(candidates) == len(self.ids)
+            if self._codes_current(len(self.ids)):
+                # Candidate generation on the codes, exact re-ranking of the best few
+                approx = self.quantizer.scores(self.codes if whole else self.codes[candidates], q)
+                shortlist = min(len(candidates), limit * self.rerank)
+                best = np.argpartition(-approx, shortlist - 1)[:shortlist]
+                candidates = np.sort(candidates[best])
+                whole = False
+
+            # Unfiltered exact search scores the matrix in place instead of gathering a copy
+            scores = (self.vectors if whole else self.vectors[candidates]) @ q
+            k = min(limit, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for i in top:
+                similarity = float(scores[i])
+                if similarity <= threshold:
+                    break
+                results.append({**self.rows[candidates[i]], "similarity": similarity})
+            return results
+
+    def vectors_for(self, ids: list):
+        """Unit-norm embeddings for `ids` (None for ids not in the index), aligned with the input."""
+        with self._lock:
+            return [
+                self.vectors[self._positions[row_id]] if row_id in self._positions else None
+                for row_id in ids
+            ]
+
+    # --- Snapshots ---
+    def save(self, directory: str):
+        """Writes the index to `directory` (vectors.npy + rows.json, plus codes.npy/quantizer.npz when quantized)."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+            if self.codes is not None:
+                np.save(os.path.join(directory, "codes.npy"), self.codes)
+                np.savez(os.path.join(directory, "quantizer.npz"), **self.quantizer.state())
+            with open(os.path.join(directory, "rows.json"), "w", encoding="utf-8") as f:
+                json.dump({"rows": self.rows, "last_refresh": self.last_refresh,
+                           "last_build": self.last_build, "embedding_model": self.embedding_model}, f)
+
+    def load(self, directory: str):
+        """Loads a snapshot; vectors are memory-mapped rather than read into RAM."""
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "rows.json"), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        snapshot_model = snapshot.get("embedding_model")
+        if self.embedding_model and snapshot_model and snapshot_model != self.embedding_model:
+            raise ValueError(f"Snapshot {directory} holds {snapshot_model} vectors, not {self.embedding_model}")
+
+        with self._lock:
+            self._set_vectors(vectors)
+            self.rows = snapshot["rows"]
+            self.ids = [row["id"] for row in self.rows]
+            self._positions = {row_id: pos for pos, row_id in enumerate(self.ids)}
+            n = len(self.ids)
+            self._sg_mask = np.zeros(n, dtype=bool)
+            self._ai_mask = np.zeros(n, dtype=bool)
+            self._regions = np.empty(n, dtype=object)
+            for pos, meta in enumerate(self.rows):
+                self._set_masks(pos, meta)
+            self._centroids = None
+            if self.mode == "ivf" and n:
+                self._train_ivf()
+            self.codes, self._quantized_size = None, 0
+            self._version += 1
+            if self._stale_ids is not None:
+                self._stale_ids.update(self.ids)
+            self.last_refresh = snapshot.get("last_refresh")
+            self.last_build = snapshot.get("last_build", self.last_refresh)
+        if self.quantizer is not None and n:
+            self._load_codes(directory)
+
+    def _load_codes(self, directory: str):
+        """Restores snapshot codes if they match this quantizer, otherwise re-encodes from the vectors."""
+        codes_path = os.path.join(directory, "codes.npy")
+        state_path = os.path.join(directory, "quantizer.npz")
+        if os.path.exists(codes_path) and os.path.exists(state_path):
+            with np.load(state_path) as state:
+                state = {key: state[key] for key in state.files}
+            codes = np.load(codes_path)
+            with self._lock:
+                if str(state["kind"]) == self.quantizer.kind and len(codes) == len(self.ids) \
+                        and codes.shape[1] == self.quantizer.code_size(self.dim):
+                    self.quantizer.load_state(state)
+                    self.codes = codes
+                    self._quantized_size = len(codes)
+                    return
+            print(f"Snapshot codes in {directory} don't match quantization={self.quantizer.kind}; re-encoding.")
+        self._retrain_codes()
@@ -0,0 +1,94 @@
+"""
+Shared, process-wide clients for Supabase and Gemini.
+
+Every entry point (SemanticSearch, VectorIndexer, BulkAnonymizer, the data
+explorers and the API handlers) goes through these factories, so a process
+loads .env once, configures Gemini once and reuses one keep-alive HTTP
+connection pool for all PostgREST calls instead of paying a TLS handshake
+per client or per request.
+
+Pool sizing and timeouts are read from the environment:
+    SUPABASE_POOL_SIZE          Max open connections to Supabase (default 20)
+    SUPABASE_KEEPALIVE_POOL     Idle keep-alive connections retained (default 10)
+    SUPABASE_KEEPALIVE_EXPIRY   Seconds an idle connection is kept (default 60)
+    SUPABASE_TIMEOUT            Request timeout in seconds (default 120)
+    GEMINI_TRANSPORT            'grpc' (SDK default) or 'rest'
+"""
+import os
+import threading
+from dotenv import load_dotenv
+
+_lock = threading.Lock()
+_env_loaded = False
+_supabase_client = None
+_gemini_configured = False
+_generative_models = {}
+
+def load_env():
+    """Loads .env once per process."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+def _build_supabase_client():
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in .env")
+
+    timeout = float(os.getenv("SUPABASE_TIMEOUT", "120"))
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("SUPABASE_POOL_SIZE", "20")),
+        max_keepalive_connections=int(os.getenv("SUPABASE_KEEPALIVE_POOL", "10")),
+        keepalive_expiry=float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+    )
+    try:
+        http_client = httpx.Client(limits=limits, timeout=timeout)
+        options = ClientOptions(httpx_client=http_client, postgrest_client_timeout=timeout)
+    except TypeError:
+        # Older supabase-py without the httpx_client option: keep its default pool
+        options = ClientOptions(postgrest_client_timeout=timeout)
+    return create_client(url, key, options=options)
+
+def get_supabase_client():
+    """Returns the shared pooled Supabase client, creating it on first use."""
+    global _supabase_client
+    if _supabase_client is None:
+        with _lock:
+            if _supabase_client is None:
+                load_env()
+                _supabase_client = _build_supabase_client()
+    return _supabase_client
+
+def configure_gemini():
+    """Configures google.generativeai once per process and returns the module."""
+    global _gemini_configured
+    import google.generativeai as genai
+
+    if not _gemini_configured:
+        with _lock:
+            if not _gemini_configured:
+                load_env()
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY must be set.")
+                transport = os.getenv("GEMINI_TRANSPORT")
+                if transport:
+                    genai.configure(api_key=api_key, transport=transport)
+                else:
+                    genai.configure(api_key=api_key)
+                _gemini_configured = True
+    return genai
+
+def get_generative_model(name: str):
+    """Returns a cached GenerativeModel so handlers don't rebuild one per request."""
+    model = _generative_models.get(name)
+    if model is None:
+        genai = configure_gemini()
+        model = genai.GenerativeModel(name)
+        _generative_models[name] = model
+    return model
@@ -1,10 +1,28 @@
 import os
+import sys
 import time
-import pandas as pd
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from scrubber import PIIScrubber # Reusing our Phase 1 scrubber
 
+# Add project root to sys.path for robust imports
+root_path = Path(__file__).resolve().parent.parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client
+
+# Per-process scrubber for worker processes: Presidio's AnalyzerEngine (and its
+# spaCy model) is loaded once per worker by the pool initializer, not per chunk.
+_worker_scrubber = None
+
+def _init_worker():
+    global _worker_scrubber
+    _worker_scrubber = PIIScrubber().warm_up()
+
+def _scrub_chunk(texts):
+    return _worker_scrubber.scrub_many(texts)
+
 class BulkAnonymizer:
     """
     [⚠️ GUARDIAN WARNING]: NON-DESTRUCTIVE SHADOW PATTERN.
@@ -12,13 +30,21 @@ class BulkAnonymizer:
     NEVER overwrite the original 'content' column. 
     The 'content' column is the absolute source of truth for raw narratives.
     """
-    def __init__(self, batch_size=50):
-        load_dotenv()
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        self.supabase = create_client(url, key)
-        self.scrubber = PIIScrubber()
+    def __init__(self, batch_size=50, workers=1):
+        """
+        Args:
+            batch_size: Rows scrubbed and written per batch.
+            workers: Scrubbing processes. 1 scrubs in-process; >1 fans batches out to a
+                process pool (each worker loads its own AnalyzerEngine) and the results
+                are written back in the original batch order.
+        """
+        self.supabase = get_supabase_client()
         self.batch_size = batch_size
+        self.workers = max(1, workers)
+        # The parent only needs its own scrubber when scrubbing in-process
+        self.scrubber = PIIScrubber() if self.workers == 1 else None
+        # Flipped off if the bulk_update_scrubbed RPC has not been deployed
+        self.bulk_rpc_available = True
 
     def run(self, limit=1000):
         print(f"--- Starting Bulk Anonymization (Limit: {limit}) ---")
@@ -40,30 +66,48 @@ class BulkAnonymizer:
 
             print(f"Found {len(rows)} rows to process.")
             
-            # 2. Process in batches
-            for i in range(0, len(rows), self.batch_size):
-                batch = rows[i:i + self.batch_size]
-                self._process_batch(batch)
+            # 2. Process in batches (scrubbed in parallel when workers > 1, written in order)
+            batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+            started = time.perf_counter()
+            for batch, scrubbed in self._scrub_batches(batches):
+                self._process_batch(batch, scrubbed)
+
+            elapsed = time.perf_counter() - started
+            print(f"Anonymized {len(rows)} rows in {elapsed:.1f}s "
+                  f"({len(rows) / elapsed if elapsed > 0 else 0.0:.1f} rows/sec, workers={self.workers})")
                 
         except Exception as e:
             print(f"Fatal error in bulk job: {e}")
 
-    def _process_batch(self, batch):
+    def _scrub_batches(self, batches):
+        """Yields (batch, scrubbed_texts) pairs in the original batch order."""
+        if self.workers == 1:
+            for batch in batches:
+                texts = [row.get("content") for row in batch]
+                yield batch, self.scrubber.scrub_many(texts)
+            return
+
+        texts = [[row.get("content") for row in batch] for batch in batches]
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            # map() returns results in submission order while workers run ahead
+            for batch, scrubbed in zip(batches, pool.map(_scrub_chunk, texts)):
+                yield batch, scrubbed
+
+    def _process_batch(self, batch, scrubbed):
         updates = []
-        for row in batch:
+        for row, scrubbed_text in zip(batch, scrubbed):
             original_text = row.get("content")
             
             if not original_text:
-                # Still mark as anonymized since there's no PII to scrub in NULL/Empty
+                # Still mark as anonymized since there's no PII to scrub in NULL/Empty.
+                # The shadow column mirrors the empty value; 'content' is never written.
                 updates.append({
                     "id": row["id"],
-                    "content": original_text,
+                    "content_scrubbed": original_text,
                     "is_anonymized": True
                 })
                 continue
             
-            scrubbed_text = self.scrubber.scrub(original_text)
-            
             updates.append({
                 "id": row["id"],
                 "content_scrubbed": scrubbed_text,
@@ -72,18 +116,75 @@ class BulkAnonymizer:
         
         if updates:
             print(f"Updating batch of {len(updates)} rows...")
-            success_count = 0
-            for update_data in updates:
-                try:
-                    row_id = update_data.pop("id")
-                    self.supabase.table("social_posts").update(update_data).eq("id", row_id).execute()
-                    success_count += 1
-                except Exception as e:
-                    print(f"Error updating row {row_id}: {e}")
+            started = time.perf_counter()
+            success_count = self._write_updates(updates)
+            elapsed = time.perf_counter() - started
+            rate = success_count / elapsed if elapsed > 0 else 0.0
             
-            print(f"Successfully updated {success_count}/{len(updates)} rows in this batch.")
+            print(f"Successfully updated {success_count}/{len(updates)} rows in this batch ({rate:.1f} rows/sec).")
+
+    def _bulk_write(self, updates, attempts=3):
+        """
+        Writes {id, content_scrubbed, is_anonymized} records in one request via the
+        bulk_update_scrubbed RPC (scripts/phase4_bulk_anonymizer_write.sql).
+        The RPC is UPDATE-only and has no access to the 'content' column.
+        Returns the updated_count reported by the RPC.
+        Retries with exponential backoff; raises the last error if every attempt fails.
+        """
+        for attempt in range(attempts):
+            try:
+                resp = self.supabase.rpc("bulk_update_scrubbed", {"updates": updates}).execute()
+                updated = resp.data if isinstance(resp.data, int) else len(updates)
+                if updated != len(updates):
+                    # Rows deleted between read and write are not anonymized, so don't count them
+                    print(f"bulk_update_scrubbed updated {updated}/{len(updates)} rows; "
+                          f"{len(updates) - updated} no longer exist.")
+                return updated
+            except Exception as e:
+                if "PGRST202" in str(e) or "Could not find the function" in str(e):
+                    print("bulk_update_scrubbed RPC not found; run scripts/phase4_bulk_anonymizer_write.sql. "
+                          "Falling back to row-level updates.")
+                    self.bulk_rpc_available = False
+                    raise
+                if attempt == attempts - 1:
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                print(f"Bulk write failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def _write_updates(self, updates):
+        """
+        Writes a batch in bulk, isolating failures by bisection: a failing batch is
+        split in half and each half retried in bulk, so only the rows that actually
+        fail end up on the row-level update path.
+        """
+        if not self.bulk_rpc_available:
+            return sum(self._write_row(update_data) for update_data in updates)
+
+        if len(updates) > 1:
+            try:
+                return self._bulk_write(updates)
+            except Exception as e:
+                if not self.bulk_rpc_available:
+                    return sum(self._write_row(update_data) for update_data in updates)
+                print(f"Bulk write of {len(updates)} rows failed ({e}), splitting batch...")
+                mid = len(updates) // 2
+                return self._write_updates(updates[:mid]) + self._write_updates(updates[mid:])
+
+        return self._write_row(updates[0])
+
+    def _write_row(self, update_data):
+        """Row-level fallback for a single record that failed in bulk."""
+        update_data = dict(update_data)
+        row_id = update_data.pop("id")
+        try:
+            self.supabase.table("social_posts").update(update_data).eq("id", row_id).execute()
+            return 1
+        except Exception as e:
+            print(f"Error updating row {row_id}: {e}")
+            return 0
 
 if __name__ == "__main__":
-    # Targeted run for AI-processed rows
-    job = BulkAnonymizer(batch_size=50)
+    # Targeted run for AI-processed rows, scrubbing on every available core
+    job = BulkAnonymizer(batch_size=50, workers=os.cpu_count() or 1)
     job.run(limit=1300)
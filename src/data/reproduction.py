@@ -1,13 +1,14 @@
-import os
 import pandas as pd
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from supabase import Client
+import sys
+from pathlib import Path
 
-def get_supabase_client() -> Client:
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    return create_client(url, key)
+# Add project root to sys.path for robust imports
+root_path = Path(__file__).resolve().parent.parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.clients import get_supabase_client
 
 def generate_report(supabase: Client):
     print("--- Generating State of the Data Report ---")
@@ -1,35 +1,159 @@
-from presidio_analyzer import AnalyzerEngine
-from presidio_anonymizer import AnonymizerEngine
-from presidio_anonymizer.entities import OperatorConfig
+import re
+
+ENTITIES = ["PERSON", "PHONE_NUMBER", "EMAIL_ADDRESS", "LOCATION", "URL"]
+
+# Replacement text per entity (wrapped in Presidio OperatorConfigs on first use)
+REPLACEMENTS = {
+    "PERSON": "[ANONYMIZED_NAME]",
+    "PHONE_NUMBER": "[ANONYMIZED_PHONE]",
+    "EMAIL_ADDRESS": "[ANONYMIZED_EMAIL]",
+    "LOCATION": "[ANONYMIZED_LOCATION]",
+    "URL": "[ANONYMIZED_URL]",
+}
+
+# --- Pre-screen (used when strict=False) ---
+# Cheap signals that a text may contain PII. Texts with none of them skip the
+# Presidio pass entirely and are returned unchanged.
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+URL_PATTERN = re.compile(r"(?:https?://|www\.)\S+|\b[\w-]+\.(?:com|net|org|sg|io|co|edu|gov|ly|me)\b", re.IGNORECASE)
+# Title-case tokens; only those that do not open a sentence count (names, places, brands)
+CAPITALIZED_PATTERN = re.compile(r"\b[A-Z][a-z'\u2019]+")
+SENTENCE_OPENERS = ".!?:;\n"
+PRONOUNS = {"I'm", "I've", "I'd", "I'll", "I\u2019m", "I\u2019ve", "I\u2019d", "I\u2019ll"}
+# Lower-case place names common in the corpus that the capitalization check would miss
+LOCATION_GAZETTEER = {
+    "singapore", "sg", "malaysia", "johor", "jb", "orchard", "jurong", "tampines", "woodlands",
+    "bedok", "yishun", "punggol", "sengkang", "toa payoh", "ang mo kio", "bishan", "clementi",
+    "bukit", "pasir ris", "hougang", "serangoon", "sentosa", "changi", "marina bay",
+}
+GAZETTEER_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(name) for name in sorted(LOCATION_GAZETTEER, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+def needs_analysis(text: str) -> bool:
+    """
+    Pre-screen: True if the text shows any cheap PII signal (email, phone, URL,
+    a mid-sentence capitalized token or a gazetteer place name), i.e. if the full
+    NER pass is needed. False means the text is treated as PII-free.
+    """
+    if EMAIL_PATTERN.search(text) or PHONE_PATTERN.search(text) or URL_PATTERN.search(text):
+        return True
+    if GAZETTEER_PATTERN.search(text):
+        return True
+    for match in CAPITALIZED_PATTERN.finditer(text):
+        if match.group(0) in PRONOUNS:
+            continue
+        preceding = text[:match.start()].rstrip(" \t\"'(*-")
+        if preceding and preceding[-1] not in SENTENCE_OPENERS:
+            return True
+    return False
 
 class PIIScrubber:
-    def __init__(self):
-        self.analyzer = AnalyzerEngine()
-        self.anonymizer = AnonymizerEngine()
+    def __init__(self, strict: bool = True):
+        """
+        Args:
+            strict: Always run the full Presidio pass (default, and the mode to use
+                for audits). With strict=False, texts that fail the regex/gazetteer
+                pre-screen (see needs_analysis) skip NER and are returned unchanged.
+                Measure the recall trade-off with scripts/evaluate_prescreen.py first.
+        """
+        self.strict = strict
+        # Presidio and its spaCy model are loaded on first scrub (or by warm_up())
+        self._analyzer = None
+        self._batch_analyzer = None
+        self._anonymizer = None
+        self._operators = None
+
+    def warm_up(self):
+        """Loads Presidio and the spaCy model now instead of on the first scrub."""
+        if self._analyzer is None:
+            from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine
+            from presidio_anonymizer import AnonymizerEngine
+            from presidio_anonymizer.entities import OperatorConfig
+
+            self._analyzer = AnalyzerEngine()
+            self._batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self._analyzer)
+            self._anonymizer = AnonymizerEngine()
+            self._operators = {
+                entity: OperatorConfig("replace", {"new_value": value})
+                for entity, value in REPLACEMENTS.items()
+            }
+        return self
+
+    @property
+    def analyzer(self):
+        return self.warm_up()._analyzer
+
+    @property
+    def batch_analyzer(self):
+        return self.warm_up()._batch_analyzer
+
+    @property
+    def anonymizer(self):
+        return self.warm_up()._anonymizer
+
+    @property
+    def operators(self):
+        return self.warm_up()._operators
 
     def scrub(self, text: str) -> str:
         if not text or not isinstance(text, str):
             return text
+        if not self.strict and not needs_analysis(text):
+            return text
         
         # Analyze the text for PII
-        results = self.analyzer.analyze(text=text, language='en', 
-                                        entities=["PERSON", "PHONE_NUMBER", "EMAIL_ADDRESS", "LOCATION", "URL"])
+        results = self.analyzer.analyze(text=text, language='en', entities=ENTITIES)
         
         # Anonymize the detected PII
         anonymized_result = self.anonymizer.anonymize(
             text=text,
             analyzer_results=results,
-            operators={
-                "PERSON": OperatorConfig("replace", {"new_value": "[ANONYMIZED_NAME]"}),
-                "PHONE_NUMBER": OperatorConfig("replace", {"new_value": "[ANONYMIZED_PHONE]"}),
-                "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": "[ANONYMIZED_EMAIL]"}),
-                "LOCATION": OperatorConfig("replace", {"new_value": "[ANONYMIZED_LOCATION]"}),
-                "URL": OperatorConfig("replace", {"new_value": "[ANONYMIZED_URL]"}),
-            }
+            operators=self.operators
         )
         
         return anonymized_result.text
 
+    def scrub_many(self, texts, batch_size: int = 50) -> list:
+        """
+        Scrubs a list of texts, returning results in the same order.
+        
+        The spaCy pipeline runs once over the whole list via nlp.pipe (Presidio's
+        BatchAnalyzerEngine); the regex recognizers and the anonymizer then run per
+        text with the same entities and operators as scrub(), so the output is
+        identical to [scrub(t) for t in texts] (including the strict/pre-screen mode).
+        
+        Args:
+            texts: Strings to scrub. Empty and non-string items are returned unchanged.
+            batch_size: Texts per nlp.pipe batch.
+        """
+        texts = list(texts)
+        scrubbed = list(texts)
+        positions = [
+            i for i, text in enumerate(texts)
+            if text and isinstance(text, str) and (self.strict or needs_analysis(text))
+        ]
+        if not positions:
+            return scrubbed
+        
+        batch_results = self.batch_analyzer.analyze_iterator(
+            texts=[texts[i] for i in positions],
+            language='en',
+            batch_size=batch_size,
+            entities=ENTITIES
+        )
+        
+        for i, results in zip(positions, batch_results):
+            scrubbed[i] = self.anonymizer.anonymize(
+                text=texts[i],
+                analyzer_results=results,
+                operators=self.operators
+            ).text
+        
+        return scrubbed
+
 if __name__ == "__main__":
     scrubber = PIIScrubber()
     sample_text = "Hi, my name is John Doe and my phone number is 123-456-7890. I live in Singapore near Orchard Road. My email is john.doe@example.com."